@@ -4,107 +4,194 @@ from PySide6 import QtWidgets, QtCore
 from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPushButton, 
                               QLabel, QTableWidget, QTableWidgetItem, QTextEdit,
                               QSplitter, QGroupBox, QFileDialog, QMessageBox,
-                              QProgressBar, QCheckBox, QTabWidget, QFrame)
+                              QProgressBar, QCheckBox, QComboBox, QTabWidget, QFrame)
 from PySide6.QtCore import Qt, Signal, QThread
 import os
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
-# mzML変換に必要なライブラリ
-try:
-    from pyteomics import mzml
-    import pyarrow as pa
-    import pyarrow.parquet as pq
-    MZML_AVAILABLE = True
-except ImportError:
-    MZML_AVAILABLE = False
+# mzMLのデコード処理（ワーカープロセスではこのモジュールだけを読み込む）
+from mzml_decode import MZML_AVAILABLE, decode_spectra, init_decode_worker, open_indexed_reader
+
+# mzML変換で書き出すParquetのスキーマ（読み込み時の最適化後と同じデータ型）
+# 最適化済みであることをメタデータに記録し、読み込み時の最適化を省略する
+PARQUET_SCHEMA = pa.schema([
+    ('scan_number', pa.int32()),
+    ('mz', pa.float32()),
+    ('intensity', pa.int64()),
+    ('ms_level', pa.int8()),
+    ('precursor_mz', pa.float32()),
+], metadata={b'optimized': b'v1'})
+
+# 各タブで使用する列（これ以外の列は読み込まない）
+LOAD_COLUMNS = ['scan_number', 'mz', 'intensity', 'ms_level', 'precursor_mz']
 
 class MzMLConversionThread(QThread):
     """mzML変換を別スレッドで実行するクラス"""
     progress_update = Signal(str)  # ログメッセージ
     conversion_finished = Signal(bool, str)  # 成功/失敗、メッセージ
     
-    def __init__(self, mzml_file_path, parquet_file_path):
+    # 1つのRow Groupとして書き出すピーク数
+    BATCH_SIZE = 1_000_000
+    # 1つのワーカータスクでデコードするスペクトル数
+    SPECTRA_PER_TASK = 200
+    # ログをまとめて送信する行数と間隔（秒）
+    LOG_FLUSH_LINES = 50
+    LOG_FLUSH_INTERVAL = 0.25
+
+    def __init__(self, mzml_file_path, parquet_file_path, compression='zstd'):
         super().__init__()
         self.mzml_file_path = mzml_file_path
         self.parquet_file_path = parquet_file_path
+        self.compression = compression
+        self.n_workers = os.cpu_count() or 1
+        self._pending_lines = []
+        self._last_flush = time.monotonic()
         
     def run(self):
         """mzML変換処理"""
+        temp_path = self.parquet_file_path + '.tmp'
         try:
-            self.progress_update.emit(f"[{datetime.now().strftime('%H:%M:%S')}] mzML変換開始")
-            self.progress_update.emit(f"入力ファイル: {os.path.basename(self.mzml_file_path)}")
-            self.progress_update.emit(f"出力ファイル: {os.path.basename(self.parquet_file_path)}")
-            
-            # データを格納するリスト
-            data_list = []
-            
-            self.progress_update.emit("mzMLファイルを読み込み中...")
-            
-            # mzMLファイルを読み込む
-            with mzml.read(self.mzml_file_path) as reader:
-                for spectrum in reader:
-                    # スペクトルIDからスキャン番号を取得
-                    scan_number = spectrum.get('index', 0)
+            self.log(f"[{datetime.now().strftime('%H:%M:%S')}] mzML変換開始")
+            self.log(f"入力ファイル: {os.path.basename(self.mzml_file_path)}")
+            self.log(f"出力ファイル: {os.path.basename(self.parquet_file_path)}")
+            
+            schema = PARQUET_SCHEMA
+            
+            # 列ごとのNumPyバッファ（満杯になったらParquetに書き出す）
+            buffers = self.allocate_buffers(schema, self.BATCH_SIZE)
+            pos = 0
+            total_peaks = 0
+            
+            self.log("mzMLファイルを読み込み中...")
+            self.flush_log()
+            # バイトオフセットのインデックスは親プロセスで一度だけ作り、リーダーごとワーカーに渡す
+            with open_indexed_reader(self.mzml_file_path) as reader:
+                n_spectra = len(reader)
+                self.log(f"スペクトル数: {n_spectra:,} (並列デコード: {self.n_workers} プロセス)")
+                self.flush_log()
+            
+                # 並列にデコードしたスペクトルを、元の順番でRow Group単位に書き出す
+                # 失敗時に既存のファイルを壊さないよう、一時ファイルに書き出してから置き換える
+                writer = pq.ParquetWriter(
+                    temp_path, schema,
+                    compression=self.compression,
+                    compression_level=1 if self.compression == 'zstd' else None,
+                    # 値の種類が少なく連続するscan_numberとms_levelだけ辞書(RLE)符号化する
+                    use_dictionary=['scan_number', 'ms_level'],
+                    data_page_size=1 << 20,
+                )
+                with writer:
+                    for stop, block in self.decode_in_parallel(reader, n_spectra):
+                        # バッファに入りきらない場合は先に書き出す
+                        n_peaks = len(block['mz'])
+                        if pos + n_peaks > len(buffers['mz']):
+                            total_peaks += self.write_batch(writer, schema, buffers, pos)
+                            pos = 0
+                            if n_peaks > len(buffers['mz']):
+                                buffers = self.allocate_buffers(schema, n_peaks)
 
-                    # m/zとIntensityの配列を取得
-                    mz_array = spectrum.get('m/z array', [])
-                    intensity_array = spectrum.get('intensity array', [])
-                    ms_level = spectrum.get('ms level', None)
-                    
-                    precursor_mz = None
+                        end = pos + n_peaks
+                        for name in schema.names:
+                            buffers[name][pos:end] = block[name]
+                        pos = end
 
-                    if ms_level == 2:
-                        precursor_info = spectrum.get('precursorList', {}).get('precursor', [{}])[0]
-                        selected_ion = precursor_info.get('selectedIonList', {}).get('selectedIon', [{}])[0]
-                        precursor_mz = selected_ion.get('selected ion m/z', None)
+                        self.log(f"デコード中... {stop:,} / {n_spectra:,} スペクトル")
 
-                    # 各ピークに対してデータを追加
-                    for mz, intensity in zip(mz_array, intensity_array):
-                        data_list.append({
-                            'scan_number': scan_number,
-                            'mz': mz,
-                            'intensity': intensity,
-                            'ms_level': ms_level,
-                            'precursor_mz': precursor_mz
-                        })
+                    total_peaks += self.write_batch(writer, schema, buffers, pos)
+            os.replace(temp_path, self.parquet_file_path)
 
-            self.progress_update.emit(f"総データ数: {len(data_list):,} ピーク")
+            self.log(f"総データ数: {total_peaks:,} ピーク")
             
-            # DataFrameに変換
-            self.progress_update.emit("DataFrameに変換中...")
-            df = pd.DataFrame(data_list)
-            
-            # データ型を最適化
-            self.progress_update.emit("データ型を最適化中...")
-            df['scan_number'] = df['scan_number'].astype('int32')
-            df['mz'] = df['mz'].astype('float64')
-            df['intensity'] = df['intensity'].astype('float64')
-            df['ms_level'] = df['ms_level'].astype('int32')
-            
-            # Parquetファイルに保存
-            self.progress_update.emit("Parquetファイルに保存中...")
-            df.to_parquet(self.parquet_file_path, engine='pyarrow', compression='snappy')
-            
-            self.progress_update.emit(f"[{datetime.now().strftime('%H:%M:%S')}] 変換完了!")
-            self.progress_update.emit(f"保存先: {self.parquet_file_path}")
-            self.progress_update.emit(f"ファイルサイズ: {os.path.getsize(self.parquet_file_path) / 1024 / 1024:.1f} MB")
-            self.progress_update.emit("-" * 50)
+            self.log(f"[{datetime.now().strftime('%H:%M:%S')}] 変換完了!")
+            self.log(f"保存先: {self.parquet_file_path}")
+            self.log(f"ファイルサイズ: {os.path.getsize(self.parquet_file_path) / 1024 / 1024:.1f} MB")
+            self.log("-" * 50)
+            self.flush_log()
             
             self.conversion_finished.emit(True, "変換が正常に完了しました")
             
         except Exception as e:
+            # 書きかけの一時ファイルを削除
+            if os.path.exists(temp_path):
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
             error_msg = f"変換エラー: {str(e)}"
-            self.progress_update.emit(f"[{datetime.now().strftime('%H:%M:%S')}] {error_msg}")
-            self.progress_update.emit("-" * 50)
+            self.log(f"[{datetime.now().strftime('%H:%M:%S')}] {error_msg}")
+            self.log("-" * 50)
+            self.flush_log()
             self.conversion_finished.emit(False, error_msg)
 
+    def log(self, message):
+        """ログメッセージを溜めておき、一定数または一定時間ごとにまとめて送信"""
+        self._pending_lines.append(message)
+        if (len(self._pending_lines) >= self.LOG_FLUSH_LINES
+                or time.monotonic() - self._last_flush >= self.LOG_FLUSH_INTERVAL):
+            self.flush_log()
+
+    def flush_log(self):
+        """溜まっているログメッセージを1回のシグナルで送信"""
+        if self._pending_lines:
+            self.progress_update.emit("\n".join(self._pending_lines))
+            self._pending_lines = []
+        self._last_flush = time.monotonic()
+
+    def decode_in_parallel(self, reader, n_spectra):
+        """スペクトルをプロセスプールでデコードし、(処理済みスペクトル数, 列ごとの配列)を順番に返す"""
+        # Qtのスレッドからfork()しないよう、全OSでspawnを使う
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.n_workers, mp_context=context,
+                                 initializer=init_decode_worker,
+                                 initargs=(reader,)) as executor:
+            # 書き出しが追いつかない場合にメモリを使い切らないよう、実行中のタスク数を制限
+            pending = deque()
+            for start in range(0, n_spectra, self.SPECTRA_PER_TASK):
+                stop = min(start + self.SPECTRA_PER_TASK, n_spectra)
+                pending.append((stop, executor.submit(decode_spectra, start, stop)))
+                if len(pending) >= self.n_workers * 2:
+                    stop, future = pending.popleft()
+                    yield stop, future.result()
+            while pending:
+                stop, future = pending.popleft()
+                yield stop, future.result()
+
+    def allocate_buffers(self, schema, size):
+        """スキーマの各列に対応するNumPyバッファを確保"""
+        return {field.name: np.empty(size, dtype=field.type.to_pandas_dtype()) for field in schema}
+
+    def write_batch(self, writer, schema, buffers, n_rows):
+        """バッファの先頭n_rows行を1つのRow Groupとして書き出し、書き出したピーク数を返す"""
+        if n_rows == 0:
+            return 0
+
+        # NaN（MS1のprecursor_mzなど）は欠損値として書き出す
+        arrays = [
+            pa.array(buffers[field.name][:n_rows], type=field.type, from_pandas=True)
+            for field in schema
+        ]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        return n_rows
+
 class DataLoaderTab(QWidget):
-    # データが読み込まれた時に発信するシグナル
-    data_loaded = Signal(pd.DataFrame)
+    # データが読み込まれた時に発信するシグナル（DataFrameを参照のまま渡す）
+    data_loaded = Signal(object)
+    
+    # これより大きいファイルはバッチ単位で読み込み、進捗を表示する
+    LARGE_FILE_SIZE = 500 * 1024 * 1024
+    READ_BATCH_SIZE = 1_048_576
     
     def __init__(self):
         super().__init__()
         self.current_data = None
+        self.parquet_source = None
         self.conversion_thread = None
         self.setup_ui()
         
@@ -190,7 +277,23 @@ class DataLoaderTab(QWidget):
             "・ms_level: 整数型"
         )
         
+        # mzML変換時の圧縮方式
+        compression_label = QLabel("圧縮:")
+        self.compression_combo = QComboBox()
+        self.compression_combo.addItem("None", 'none')
+        self.compression_combo.addItem("Snappy", 'snappy')
+        self.compression_combo.addItem("ZSTD", 'zstd')
+        self.compression_combo.setCurrentIndex(2)
+        self.compression_combo.setToolTip(
+            "mzML変換で作成するParquetファイルの圧縮方式\n"
+            "・None: 圧縮なし（RAMディスクや高速なSSDでは展開処理がない分速い）\n"
+            "・Snappy: 軽い圧縮\n"
+            "・ZSTD: Snappyと同程度の速さで約2倍小さくなる（推奨）"
+        )
+        
         optimize_layout.addWidget(self.optimize_checkbox)
+        optimize_layout.addWidget(compression_label)
+        optimize_layout.addWidget(self.compression_combo)
         optimize_layout.addStretch()
         
         file_layout.addLayout(file_select_layout)
@@ -275,6 +378,8 @@ class DataLoaderTab(QWidget):
         
         self.log_text = QTextEdit()
         self.log_text.setReadOnly(True)
+        # 古いログは削除して、追記のコストが増え続けないようにする
+        self.log_text.document().setMaximumBlockCount(2000)
         self.log_text.setFont(QtWidgets.QApplication.font())
         
         log_group_layout.addLayout(log_controls)
@@ -331,8 +436,15 @@ class DataLoaderTab(QWidget):
             base_name = os.path.splitext(mzml_file_path)[0]
             parquet_file_path = base_name + ".parquet"
             
+            # 読み込み済みのファイルに上書きする場合に備えてメモリマップを閉じる
+            # （Windowsではメモリマップ中のファイルを上書きできないため）
+            self.release_parquet_source()
+            
             # 変換スレッドを作成して実行
-            self.conversion_thread = MzMLConversionThread(mzml_file_path, parquet_file_path)
+            self.conversion_thread = MzMLConversionThread(
+                mzml_file_path, parquet_file_path,
+                compression=self.compression_combo.currentData()
+            )
             self.conversion_thread.progress_update.connect(self.update_log)
             self.conversion_thread.conversion_finished.connect(self.on_conversion_finished)
             
@@ -352,7 +464,7 @@ class DataLoaderTab(QWidget):
             self.progress_bar.setVisible(False)
             
     def update_log(self, message):
-        """ログを更新"""
+        """ログを更新（複数行のメッセージはまとめて追記）"""
         self.log_text.append(message)
         # 自動スクロール（より簡単な方法）
         self.log_text.ensureCursorVisible()
@@ -397,20 +509,38 @@ class DataLoaderTab(QWidget):
             self.info_text.setText("ファイルを読み込み中...")
             QtWidgets.QApplication.processEvents()
             
-            self.current_data = pd.read_parquet(file_path)
+            # ファイルをメモリマップで開き、必要な列だけをマルチスレッドで読み込む
+            # （Arrowのバッファは変換しながら解放する）
+            self.release_parquet_source()
+            self.parquet_source = pa.memory_map(file_path, 'r')
+            parquet_file = pq.ParquetFile(self.parquet_source)
+            schema = parquet_file.schema_arrow
+            # pandasで保存したファイルのインデックス列は読み込まない
+            columns = ([name for name in LOAD_COLUMNS if name in schema.names]
+                       or [name for name in schema.names if not name.startswith('__index_level_')])
+            if os.path.getsize(file_path) > self.LARGE_FILE_SIZE:
+                table = self.read_in_batches(parquet_file, columns)
+            else:
+                table = parquet_file.read(columns=columns, use_threads=True)
+            self.current_data = table.to_pandas(split_blocks=True, self_destruct=True,
+                                                ignore_metadata=True)
+            del table
             
-            # データ型最適化
-            if self.optimize_checkbox.isChecked():
+            # データ型最適化（mzML変換で作成したファイルは最適化済みのため不要）
+            if self.optimize_checkbox.isChecked() and not self.is_optimized_schema(schema):
                 self.info_text.setText("データ型を最適化中...")
                 QtWidgets.QApplication.processEvents()
                 
-                original_memory = self.current_data.memory_usage(deep=True).sum()
+                original_memory = self.memory_usage_bytes(self.current_data)
                 self.current_data = self.optimize_data_types(self.current_data)
-                optimized_memory = self.current_data.memory_usage(deep=True).sum()
+                optimized_memory = self.memory_usage_bytes(self.current_data)
                 
                 memory_reduction = (1 - optimized_memory / original_memory) * 100
                 print(f"最適化完了 - メモリ使用量 {memory_reduction:.1f}% 削減")
             
+            # スキャン番号順に並べる（タブ側でスキャン単位の連続した範囲として切り出すため）
+            self.sort_by_scan(self.current_data)
+            
             # UI更新
             self.file_path_label.setText(f"読み込み済み: {os.path.basename(file_path)}")
             self.file_path_label.setStyleSheet("color: green;")
@@ -436,34 +566,76 @@ class DataLoaderTab(QWidget):
             self.file_path_label.setText("読み込み失敗")
             self.file_path_label.setStyleSheet("color: red;")
             
-    def optimize_data_types(self, df):
-        """データ型を最適化"""
-        df = df.copy()
+    def sort_by_scan(self, df):
+        """scan_numberで並べ替え（同じスキャン内の行の順序は保つ）"""
+        if 'scan_number' not in df.columns:
+            return
         
+        # mzML変換で作成したファイルは並んでいるので並べ替えは省略される
+        if not df['scan_number'].is_monotonic_increasing:
+            df.sort_values('scan_number', kind='mergesort', inplace=True)
+            df.reset_index(drop=True, inplace=True)
+            
+    def read_in_batches(self, parquet_file, columns):
+        """Parquetファイルをバッチ単位で読み込み、プログレスバーに進捗を表示"""
+        n_batches = -(-parquet_file.metadata.num_rows // self.READ_BATCH_SIZE)
+        self.progress_bar.setRange(0, max(n_batches, 1))
+        
+        batches = []
+        for i, batch in enumerate(parquet_file.iter_batches(batch_size=self.READ_BATCH_SIZE,
+                                                            columns=columns, use_threads=True), 1):
+            batches.append(batch)
+            self.progress_bar.setValue(i)
+            QtWidgets.QApplication.processEvents()
+        
+        self.progress_bar.setRange(0, 0)  # 不定進行に戻す
+        return pa.Table.from_batches(batches)
+            
+    def release_parquet_source(self):
+        """メモリマップで開いているParquetファイルを閉じる"""
+        if self.parquet_source is not None:
+            self.parquet_source.close()
+            self.parquet_source = None
+            
+    def is_optimized_schema(self, schema):
+        """最適化済みのデータ型で保存されたファイル（メタデータで判定）のスキーマかを判定"""
+        metadata = schema.metadata or {}
+        return metadata.get(b'optimized') == b'v1'
+            
+    def optimize_data_types(self, df):
+        """データ型を最適化（読み込んだDataFrameをそのまま書き換える）"""
         # scan_number: 整数型
         if 'scan_number' in df.columns:
-            df['scan_number'] = df['scan_number'].astype('int32')
+            df['scan_number'] = df['scan_number'].astype('int32', copy=False)
         
-        # mz: float32 (小数点5桁)
+        # mz: float32（測定範囲のm/zではfloat32の精度が小数点5桁に足りるため丸めは省略）
         if 'mz' in df.columns:
-            df['mz'] = df['mz'].round(5).astype('float32')
+            df['mz'] = df['mz'].to_numpy(dtype=np.float32, copy=False)
         
         # intensity: 整数型 (小数点以下切り捨て)
         if 'intensity' in df.columns:
-            df['intensity'] = df['intensity'].astype('int64')
+            df['intensity'] = df['intensity'].astype('int64', copy=False)
         
         # ms_level: 整数型
         if 'ms_level' in df.columns:
-            df['ms_level'] = df['ms_level'].astype('int8')
+            df['ms_level'] = df['ms_level'].astype('int8', copy=False)
         
-        # precursor_mz: float32 (小数点5桁、NaN対応)
+        # precursor_mz: float32 (小数点5桁、NaNはそのまま)
         if 'precursor_mz' in df.columns:
-            # NaNは保持しつつ、有効な値のみ丸める
-            mask = df['precursor_mz'].notna()
-            df.loc[mask, 'precursor_mz'] = df.loc[mask, 'precursor_mz'].round(5)
-            df['precursor_mz'] = df['precursor_mz'].astype('float32')
+            df['precursor_mz'] = self.round_to_float32(df['precursor_mz'])
         
         return df
+        
+    def round_to_float32(self, values):
+        """小数点5桁に丸めてfloat32に変換（Arrowの丸めはNaNをそのまま通すためマスク不要）"""
+        arr = pa.array(values.to_numpy(dtype=np.float64, copy=False))
+        rounded = pc.round(arr, ndigits=5).cast(pa.float32())
+        return rounded.to_numpy(zero_copy_only=False)
+            
+    def memory_usage_bytes(self, df):
+        """メモリ使用量（object列がなければ各要素を辿らない浅い集計で正確）"""
+        deep = any(dtype == object for dtype in df.dtypes)
+        return df.memory_usage(deep=deep).sum()
             
     def display_data_info(self, file_path):
         """データの基本情報を表示"""
@@ -473,7 +645,7 @@ class DataLoaderTab(QWidget):
         info_text = f"""ファイル: {os.path.basename(file_path)}
 行数: {len(self.current_data):,}
 列数: {len(self.current_data.columns)}
-メモリ使用量: {self.current_data.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB
+メモリ使用量: {self.memory_usage_bytes(self.current_data) / 1024 / 1024:.1f} MB
 
 列名:
 {', '.join(self.current_data.columns.tolist())}
@@ -504,11 +676,18 @@ class DataLoaderTab(QWidget):
         self.data_table.setColumnCount(len(preview_data.columns))
         self.data_table.setHorizontalHeaderLabels(preview_data.columns.tolist())
         
-        # データ挿入
-        for i, row in enumerate(preview_data.itertuples(index=False)):
-            for j, value in enumerate(row):
-                item = QTableWidgetItem(str(value))
-                self.data_table.setItem(i, j, item)
+        # データ挿入（挿入中は再描画とシグナルを止める）
+        # 列ごとにNumPy配列で取り出し、各列のデータ型のまま表示する
+        self.data_table.setUpdatesEnabled(False)
+        self.data_table.blockSignals(True)
+        try:
+            for j, column in enumerate(preview_data.columns):
+                values = preview_data[column].to_numpy()
+                for i in range(len(values)):
+                    self.data_table.setItem(i, j, QTableWidgetItem(str(values[i])))
+        finally:
+            self.data_table.blockSignals(False)
+            self.data_table.setUpdatesEnabled(True)
                 
         # 列幅自動調整
         self.data_table.resizeColumnsToContents()
@@ -519,35 +698,58 @@ class DataLoaderTab(QWidget):
             return
             
         try:
-            # 数値列の統計情報
-            numeric_summary = self.current_data.describe()
-            
-            # 欠損値情報
-            missing_info = self.current_data.isnull().sum()
-            missing_info = missing_info[missing_info > 0]
-            
-            summary_text = "=== 数値列の統計情報 ===\n"
-            summary_text += numeric_summary.to_string()
-            
-            if not missing_info.empty:
-                summary_text += "\n\n=== 欠損値情報 ===\n"
-                summary_text += missing_info.to_string()
-            else:
-                summary_text += "\n\n=== 欠損値情報 ===\n欠損値はありません"
-                
-            # ユニーク値の情報（カテゴリカル列）
-            categorical_cols = self.current_data.select_dtypes(include=['object']).columns
-            if len(categorical_cols) > 0:
-                summary_text += "\n\n=== カテゴリカル列のユニーク値数 ===\n"
-                for col in categorical_cols:
-                    unique_count = self.current_data[col].nunique()
-                    summary_text += f"{col}: {unique_count}\n"
-            
-            self.summary_text.setText(summary_text)
+            self.summary_text.setText(self.build_data_summary())
             
         except Exception as e:
             self.summary_text.setText(f"統計情報の生成中にエラーが発生しました:\n{str(e)}")
             
+    def build_data_summary(self):
+        """統計サマリーのテキストを作成（pyarrow.computeで列ごとに集計）"""
+        table = pa.Table.from_pandas(self.current_data, preserve_index=False)
+        
+        # 数値列の統計情報（describe()と同じ項目）
+        stats = {}
+        for name in table.column_names:
+            column = table.column(name)
+            if not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+                continue
+            min_max = pc.min_max(column)
+            quartiles = pc.quantile(column, q=[0.25, 0.5, 0.75])
+            stats[name] = [
+                pc.count(column).as_py(),
+                pc.mean(column).as_py(),
+                pc.stddev(column, ddof=1).as_py(),
+                min_max['min'].as_py(),
+                *quartiles.to_pylist(),
+                min_max['max'].as_py(),
+            ]
+        numeric_summary = pd.DataFrame(
+            stats, index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'], dtype=float
+        )
+        
+        # 欠損値情報（NaNはArrowでは欠損値として数えられる）
+        missing_info = pd.Series({name: table.column(name).null_count for name in table.column_names})
+        missing_info = missing_info[missing_info > 0]
+        
+        summary_text = "=== 数値列の統計情報 ===\n"
+        summary_text += numeric_summary.to_string()
+        
+        if not missing_info.empty:
+            summary_text += "\n\n=== 欠損値情報 ===\n"
+            summary_text += missing_info.to_string()
+        else:
+            summary_text += "\n\n=== 欠損値情報 ===\n欠損値はありません"
+            
+        # ユニーク値の情報（カテゴリカル列）
+        categorical_cols = self.current_data.select_dtypes(include=['object']).columns
+        if len(categorical_cols) > 0:
+            summary_text += "\n\n=== カテゴリカル列のユニーク値数 ===\n"
+            for col in categorical_cols:
+                unique_count = self.current_data[col].nunique()
+                summary_text += f"{col}: {unique_count}\n"
+        
+        return summary_text
+            
     def get_current_data(self):
         """現在読み込まれているデータを取得"""
         return self.current_data
\ No newline at end of file
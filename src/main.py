@@ -1,5 +1,6 @@
 import sys
-import pandas as pd
+import multiprocessing
+import matplotlib
 from PySide6 import QtWidgets, QtCore
 from PySide6.QtWidgets import (QApplication, QMainWindow, QTabWidget, 
                               QVBoxLayout, QWidget, QMenuBar, QFileDialog, 
@@ -11,9 +12,16 @@ from zoom_viewer_tab import ZoomViewerTab
 from simple_ms1_tab import SimpleMS1Tab
 from ms1_ms2_tab import MS1MS2Tab
 
+# グラフの日本語フォントはアプリ全体で一度だけ設定する
+matplotlib.rcParams['font.family'] = 'Yu Gothic'
+# 点の多い線（クロマトグラム・プロファイル）は描画前に間引き、分割して描画する
+matplotlib.rcParams['path.simplify'] = True
+matplotlib.rcParams['path.simplify_threshold'] = 1.0
+matplotlib.rcParams['agg.path.chunksize'] = 10000
+
 class MSAnalysisApp(QMainWindow):
-    # データが更新されたときに発信するシグナル
-    data_updated = QtCore.Signal(pd.DataFrame)
+    # データが更新されたときに発信するシグナル（DataFrameを参照のまま渡す）
+    data_updated = QtCore.Signal(object)
     
     def __init__(self):
         super().__init__()
@@ -140,6 +148,9 @@ class MSAnalysisApp(QMainWindow):
             event.ignore()
 
 if __name__ == "__main__":
+    # exe化した場合にmzML変換のワーカープロセスを起動できるようにする
+    multiprocessing.freeze_support()
+
     app = QApplication(sys.argv)
     
     # アプリケーションの詳細設定
@@ -1,23 +1,75 @@
 import pandas as pd
+import numpy as np
 from PySide6 import QtWidgets, QtCore
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib.ticker import ScalarFormatter
 from matplotlib.gridspec import GridSpec
+from matplotlib.collections import PolyCollection
+from matplotlib.patches import Rectangle
 
-import matplotlib.pyplot as plt
-plt.rcParams['font.family'] = 'Yu Gothic'
+from spectrum_kernels import build_segments, pixel_reduce, warm_up
+
+# スペクトルに表示するm/zの上限
+DISPLAY_MZ_MAX = 200
+
+# 表示処理で使うデータ型（float32で十分な精度があり、メモリ転送量が半分になる）
+SPECTRUM_DTYPES = {
+    'scan_number': np.int32,
+    'mz': np.float32,
+    'intensity': np.float32,
+    'ms_level': np.int8,
+    'precursor_mz': np.float32,
+}
+
+# 説明文の内容（ここを編集してください）
+DESCRIPTION_HTML = """
+<h3>使用方法</h3>
+<p><b>1. データ処理</b><br>
+「データ読み込み」タブでparqetファイルを読み込み「データ表示」をクリック</p>
+
+<p><b>2. スペクトル表示</b><br>
+クロマトグラム上をクリックすると、そのスキャンのスペクトルが表示されます。</p>
+
+<p><b>3. キーボード操作</b><br>
+← → キーでスキャン間を移動できます。</p>
+
+<h3>表示内容</h3>
+<p><b>上段:</b> クロマトグラム（全MS強度）<br>
+<b>中段:</b> MS1スペクトル（青色）<br>
+<b>下段:</b> MS2スペクトル（黒色）</p>
+
+<h3>ハイライトの説明</h3>
+• MS1スペクトルの<span style="background-color: yellow;">黄色</span>はIsolation Windowの幅です。<br>
+• MS2スペクトルの<span style="background-color: red; color: white;">赤色</span>はPrecursor ionです。</p>
+
+<h3>Y軸スケール</h3>
+<p>• <b>クロマトグラム:</b> 固定スケール<br>
+• <b>MS1:</b> 固定スケール（比較用）<br>
+• <b>MS2:</b> 可変スケール（各スペクトルの最大値に自動調整）</p>
+
+<h3>特徴</h3>
+<p>• スペクトルは同レベルの次のスペクトルまで保持<br>
+• m/z < 200 のデータのみ表示</p>
+"""
 
 class MS1MS2Tab(QWidget):
+    _description_document = None
+
     def __init__(self):
         super().__init__()
         self.df = None
+        self._scan_index = {}
         self.current_scan = None
         self.all_scans = []
+        self._scans_arr = np.array([], dtype=np.int64)
+        self._prev_ms1_idx = np.array([], dtype=np.int64)
         self.scan_line = None
-        self.ms2_shading_ms1 = None
-        self.ms2_shading_ms2 = None
+        self._chrom_bg = None
+        self.ms1_windows = []
+        self.ms1_highlights = None
+        self.ms2_highlight = None
         
         self.setup_ui()
         
@@ -82,10 +134,12 @@ class MS1MS2Tab(QWidget):
         
         # イベント接続
         self.canvas.mpl_connect("button_press_event", self.on_click)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
         
     def create_description_area(self):
         """説明文エリアを作成"""
         from PySide6.QtWidgets import QTextEdit
+        from PySide6.QtGui import QTextDocument
         from PySide6.QtCore import Qt
         
         self.description_widget = QWidget()
@@ -101,38 +155,11 @@ class MS1MS2Tab(QWidget):
         description_text.setReadOnly(True)
         description_text.setMaximumHeight(600)
         
-        # 説明文の内容（ここを編集してください）
-        description_content = """
-<h3>使用方法</h3>
-<p><b>1. データ処理</b><br>
-「データ読み込み」タブでparqetファイルを読み込み「データ表示」をクリック</p>
-
-<p><b>2. スペクトル表示</b><br>
-クロマトグラム上をクリックすると、そのスキャンのスペクトルが表示されます。</p>
-
-<p><b>3. キーボード操作</b><br>
-← → キーでスキャン間を移動できます。</p>
-
-<h3>表示内容</h3>
-<p><b>上段:</b> クロマトグラム（全MS強度）<br>
-<b>中段:</b> MS1スペクトル（青色）<br>
-<b>下段:</b> MS2スペクトル（黒色）</p>
-
-<h3>ハイライトの説明</h3>
-• MS1スペクトルの<span style="background-color: yellow;">黄色</span>はIsolation Windowの幅です。<br>
-• MS2スペクトルの<span style="background-color: red; color: white;">赤色</span>はPrecursor ionです。</p>
-
-<h3>Y軸スケール</h3>
-<p>• <b>クロマトグラム:</b> 固定スケール<br>
-• <b>MS1:</b> 固定スケール（比較用）<br>
-• <b>MS2:</b> 可変スケール（各スペクトルの最大値に自動調整）</p>
-
-<h3>特徴</h3>
-<p>• スペクトルは同レベルの次のスペクトルまで保持<br>
-• m/z < 200 のデータのみ表示</p>
-        """
-        
-        description_text.setHtml(description_content)
+        # 説明文のHTMLは一度だけ解析し、作成したドキュメントを共有する
+        if MS1MS2Tab._description_document is None:
+            MS1MS2Tab._description_document = QTextDocument()
+            MS1MS2Tab._description_document.setHtml(DESCRIPTION_HTML)
+        description_text.setDocument(MS1MS2Tab._description_document)
         description_text.setStyleSheet("""
             QTextEdit {
                 background-color: #f8f9fa;
@@ -162,14 +189,25 @@ class MS1MS2Tab(QWidget):
         self.ax_ms2.set_title("MS2 Spectrum")
         
         self.figure.subplots_adjust(left = 0.07)
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
     def set_data(self, df):
         """外部からデータをセット"""
-        self.df = df.copy()
+        # 浅いコピーに型を変える列だけを入れ直す（他の列はコピーせず共有し、共有データは変更しない）
+        # astypeはpandas 2では全列をコピーするため使わない
+        self.df = df.copy(deep=False)
+        for name, dtype in self.display_dtypes(df).items():
+            if df[name].dtype != dtype:
+                self.df[name] = df[name].astype(dtype)
         self.status_label.setText(f"データ受信完了 ({len(df)} 行) - MS1/MS2データを処理してください")
         self.process_button.setEnabled(True)
         
+    def display_dtypes(self, df):
+        """存在する列の変換先データ型（整数列は欠損値を含みうる浮動小数点のままなら変換しない）"""
+        return {name: dtype for name, dtype in SPECTRUM_DTYPES.items()
+                if name in df.columns
+                and (np.issubdtype(dtype, np.floating) or pd.api.types.is_integer_dtype(df[name]))}
+
     def process_data(self):
         """MS1/MS2データの処理"""
         if self.df is None:
@@ -184,35 +222,71 @@ class MS1MS2Tab(QWidget):
                                              f"必要な列が見つかりません: {required_cols}")
                 return
 
+            # numbaの関数を初回の処理時にコンパイルしておく
+            warm_up()
+
+            # スキャンごとの配列を作成（クリック・キー操作時は全行を検索しない）
+            self.sort_by_scan_and_mz()
+            self.build_scan_index()
             
             # クロマトグラムの作成
-            chrom_df = self.df.groupby("scan_number")["intensity"].sum().reset_index()
-            chrom_df = chrom_df.sort_values("scan_number")
-            self.all_scans = chrom_df["scan_number"].tolist()
+            # スキャン番号は小さな整数なので、番号を添字にして強度を合計する
+            scan_numbers = self.df['scan_number'].to_numpy()
+            # 浮動小数点で保存されていても値が整数なら、整数に直して添字に使う
+            if (not np.issubdtype(scan_numbers.dtype, np.integer)
+                    and np.array_equal(scan_numbers, np.trunc(scan_numbers))):
+                scan_numbers = scan_numbers.astype(np.int64)
+            if np.issubdtype(scan_numbers.dtype, np.integer) and scan_numbers.min() >= 0:
+                totals = np.bincount(scan_numbers, weights=self.df['intensity'].to_numpy())
+                self._scans_arr = np.flatnonzero(np.bincount(scan_numbers))
+                chrom_intensity = totals[self._scans_arr]
+            else:
+                # 添字にできないスキャン番号（小数・負の値・欠損値）はgroupbyで集計する
+                chrom = self.df.groupby('scan_number')['intensity'].sum()
+                self._scans_arr = chrom.index.to_numpy()
+                chrom_intensity = chrom.to_numpy()
+            self.all_scans = self._scans_arr.tolist()
+
+            # 各スキャン以前で最後のMS1スキャンの位置（MS1がなければ-1）
+            is_ms1 = np.array([1 in self._scan_index[scan] for scan in self.all_scans], dtype=bool)
+            self._prev_ms1_idx = np.where(is_ms1, np.arange(len(is_ms1)), -1)
+            np.maximum.accumulate(self._prev_ms1_idx, out=self._prev_ms1_idx)
 
             # Y軸の最大値を事前に計算して固定
-            self.chrom_max_intensity = chrom_df["intensity"].max() * 1.05  # 5%マージン
+            self.chrom_max_intensity = chrom_intensity.max() * 1.05  # 5%マージン
 
             # MS2は可変にするため、ここでは設定しない
 
             self.ax_chrom.clear()
-            self.ax_chrom.plot(chrom_df["scan_number"], chrom_df["intensity"], color="black")
+            self.ax_chrom.plot(self._scans_arr, chrom_intensity, color="black")
             self.ax_chrom.set_title("Chromatogram (All MS Levels)", fontsize = 10)
             self.ax_chrom.set_xlabel("Scan Number")
             self.ax_chrom.set_ylabel("Total Intensity")
             self.ax_chrom.grid(True)
             self.ax_chrom.set_ylim(0, self.chrom_max_intensity)  # Y軸固定
+            self.ax_chrom.autoscale_view()
+            self.ax_chrom.set_autoscale_on(False)
+
+            # スキャン位置の赤線（通常の描画には含めず、ブリットで重ねる）
+            self.scan_line = self.ax_chrom.axvline(self.all_scans[0], color='red', linestyle='--',
+                                                   linewidth=1, animated=True)
+            self.scan_line.set_visible(False)
 
-            # m/z範囲の設定
-            ms1_data = self.df[self.df['ms_level'] == 1]
+            # m/z範囲の設定（表示するm/z < DISPLAY_MZ_MAX のデータから計算）
+            displayed = self.df[self.df['mz'] < DISPLAY_MZ_MAX]
+            ms1_data = displayed[displayed['ms_level'] == 1]
             if not ms1_data.empty:
                 self.all_mz_min = ms1_data['mz'].min() - 10
                 self.all_mz_max = ms1_data['mz'].max() + 10
             else:
                 # PRMデータなどMS1がない場合は全データから計算
-                self.all_mz_min = self.df['mz'].min() - 10
-                self.all_mz_max = self.df['mz'].max() + 10
+                self.all_mz_min = displayed['mz'].min() - 10
+                self.all_mz_max = displayed['mz'].max() + 10
 
+            # 表示に使う配列はスキャンごとのインデックスに持ったので、フレームは保持しない
+            # （同じデータを処理し直す必要はないため、新しいデータを受け取るまで処理ボタンは無効）
+            self.df = None
+            self.process_button.setEnabled(False)
 
             # 科学的記数法のフォーマッタ
             formatter = ScalarFormatter(useMathText=True)
@@ -223,8 +297,7 @@ class MS1MS2Tab(QWidget):
             # 初期のスペクトルプロット設定
             self.setup_spectrum_plots()
 
-            self.figure.subplots_adjust(left=0.07)
-            self.canvas.draw()
+            self.canvas.draw_idle()
 
             self.status_label.setText(f"処理完了 - スキャン数: {len(self.all_scans)} (クロマトグラムをクリックしてください)")
 
@@ -232,54 +305,164 @@ class MS1MS2Tab(QWidget):
             QtWidgets.QMessageBox.critical(self, "処理エラー", f"データの処理中にエラーが発生しました:\n{str(e)}")
             
     def setup_spectrum_plots(self):
-        """スペクトルプロットの初期設定"""
+        """スペクトルプロットの初期設定（スペクトルの線は作成したものを使い回す）"""
         self.ax_ms1.clear()
-        self.ax_ms1.set_title("MS1 Spectrum", fontsize=10)
-        self.ax_ms1.set_xlabel("m/z", fontsize=5)
+        self.ms1_title = self.ax_ms1.set_title("MS1 Spectrum")
+        self.ax_ms1.set_xlabel("m/z")
         self.ax_ms1.set_ylabel("Intensity")
         self.ax_ms1.grid(True)
+        self.ms1_lines = self.ax_ms1.vlines([], 0, [], color='blue', linewidth=1, alpha=0.7)
+        self.ax_ms1.set_xlim(self.all_mz_min, self.all_mz_max)
         
         self.ax_ms2.clear()
-        self.ax_ms2.set_title("MS2 Spectrum", fontsize=10)
-        self.ax_ms2.set_xlabel("m/z", fontsize=5)
+        self.ms2_title = self.ax_ms2.set_title("MS2 Spectrum")
+        self.ax_ms2.set_xlabel("m/z")
         self.ax_ms2.set_ylabel("Intensity")
         self.ax_ms2.grid(True)
+        self.ms2_lines = self.ax_ms2.vlines([], 0, [], color='black', linewidth=1, alpha=0.7)
+        self.ax_ms2.set_xlim(self.all_mz_min, self.all_mz_max)
+        
+        # MS1・MS2のY軸も科学的記数法に統一（フォーマッタは軸ごとに1つ作成して使い続ける）
+        for ax in (self.ax_ms1, self.ax_ms2):
+            formatter = ScalarFormatter(useMathText=True)
+            formatter.set_scientific(True)
+            formatter.set_powerlimits((-3, 3))
+            ax.yaxis.set_major_formatter(formatter)
+        
+        # 範囲は明示的に設定するので、線やハイライトの追加時に自動調整させない
+        self.ax_ms1.set_autoscale_on(False)
+        self.ax_ms2.set_autoscale_on(False)
+        
+        # ハイライトも作成したものを使い回す（Y方向は軸の高さ全体）
+        # MS1: Isolation Windowの幅（黄色、次のMS1表示まで累積）
+        self.ms1_windows = []
+        self.ms1_highlights = PolyCollection([], transform=self.ax_ms1.get_xaxis_transform(),
+                                             facecolor='yellow', edgecolor='yellow', alpha=0.8)
+        self.ax_ms1.add_collection(self.ms1_highlights, autolim=False)
+        # MS2: Precursor ion（赤色）
+        self.ms2_highlight = Rectangle((0, 0), 0, 1, transform=self.ax_ms2.get_xaxis_transform(),
+                                       color='red', alpha=1, visible=False)
+        self.ax_ms2.add_patch(self.ms2_highlight)
+
+    def reduce_to_pixels(self, ax, mz, intensity):
+        """横軸の1ピクセルに複数のピークが入る場合は最大強度のピークだけを残す"""
+        n_pixels = max(int(ax.bbox.width), 1)
+        if len(mz) <= n_pixels:
+            return mz, intensity
+        mz_min, mz_max = ax.get_xlim()
+        return pixel_reduce(mz, intensity, mz_min, mz_max, n_pixels)
+
+    def clear_ms1_highlights(self):
+        """MS1スペクトル上のIsolation Windowのハイライトをすべて削除"""
+        self.ms1_windows = []
+        self.ms1_highlights.set_verts([])
+
+    def add_ms1_highlight(self, mz_min, mz_max):
+        """MS1スペクトルにIsolation Windowのハイライトを追加（次のMS1表示まで残す）"""
+        self.ms1_windows.append([(mz_min, 0), (mz_max, 0), (mz_max, 1), (mz_min, 1)])
+        self.ms1_highlights.set_verts(self.ms1_windows)
+
+    def show_ms2_highlight(self, mz_min, mz_max):
+        """MS2スペクトルのPrecursor ionの位置をハイライト"""
+        self.ms2_highlight.set_x(mz_min)
+        self.ms2_highlight.set_width(mz_max - mz_min)
+        self.ms2_highlight.set_visible(True)
 
     def keyPressEvent(self, event):
         """キー操作でスキャン移動"""
         if self.current_scan is None or not self.all_scans:
             return
-        idx = self.all_scans.index(self.current_scan)
+        idx = int(np.searchsorted(self._scans_arr, self.current_scan))
         if event.key() == QtCore.Qt.Key_Left and idx > 0:
             self.update_scan(self.all_scans[idx - 1])
         elif event.key() == QtCore.Qt.Key_Right and idx < len(self.all_scans) - 1:
             self.update_scan(self.all_scans[idx + 1])
 
-    def safe_remove_artist(self, artist):
-        """アーティストを安全に削除する関数"""
-        if artist is not None:
-            try:
-                artist.remove()
-            except (NotImplementedError, ValueError):
-                pass
-        return None
+    def sort_by_scan_and_mz(self):
+        """scan_number・mzの順に並べる（各スキャンが連続した範囲になる。並んでいれば何もしない）"""
+        scan_step = np.diff(self.df['scan_number'].to_numpy())
+        mz_step = np.diff(self.df['mz'].to_numpy())
+        if np.all((scan_step > 0) | ((scan_step == 0) & (mz_step >= 0))):
+            return
+        self.df = self.df.sort_values(['scan_number', 'mz'], kind='stable', ignore_index=True)
+
+    def build_scan_index(self):
+        """スキャン番号・MSレベルごとにmz・intensity・precursor_mzの配列をまとめる（m/zは表示する範囲のみ）"""
+        mz = self.df['mz'].to_numpy()
+        intensity = self.df['intensity'].to_numpy()
+        precursor = self.df['precursor_mz'].to_numpy() if 'precursor_mz' in self.df.columns else None
+        ms_levels = self.df['ms_level'].to_numpy()
+        
+        # scan_number順に並んでいるので、各スキャンの範囲を列のスライス（コピーなし）で切り出す
+        # 先頭行はscan_numberが変わる位置から求める（並べ替え・ハッシュは不要）
+        scan_numbers = self.df['scan_number'].to_numpy()
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(scan_numbers)) + 1, [len(scan_numbers)]))
+        scans = scan_numbers[starts[:-1]]
+        # 各スキャン内はmz順なので、表示するm/z < DISPLAY_MZ_MAX の範囲は各スキャンの先頭部分になる
+        # （スキャン・MSレベルの有無は絞り込み前のデータで判定し、表示範囲にピークがなくても空の配列として持つ）
+        kept_before = np.concatenate(([0], np.cumsum(mz < DISPLAY_MZ_MAX)))
+        cuts = starts[:-1] + np.diff(kept_before[starts])
+        
+        self._scan_index = {}
+        for scan, start, cut, stop in zip(scans.tolist(), starts[:-1], cuts, starts[1:]):
+            levels = ms_levels[start:stop]
+            if (levels == levels[0]).all():
+                # 通常は1スキャン1レベルなので、スライスのまま使う
+                # プリカーサーm/zはスキャン内で同じ値なので、絞り込まずに持つ
+                self._scan_index[scan] = {int(levels[0]): {
+                    'mz': mz[start:cut],
+                    'intensity': intensity[start:cut],
+                    'precursor_mz': precursor[start:stop] if precursor is not None else None,
+                }}
+            else:
+                self._scan_index[scan] = {}
+                for level in np.unique(levels):
+                    rows = np.flatnonzero(levels == level) + start
+                    shown = rows[mz[rows] < DISPLAY_MZ_MAX]
+                    self._scan_index[scan][int(level)] = {
+                        'mz': mz[shown],
+                        'intensity': intensity[shown],
+                        'precursor_mz': precursor[rows] if precursor is not None else None,
+                    }
+
+    def get_scan_arrays(self, scan_number, ms_level):
+        """指定したスキャン・MSレベルの配列を取得（該当データがなければNone）"""
+        return self._scan_index.get(scan_number, {}).get(ms_level)
 
     def find_ms1_scan(self, target_scan):
         """指定されたスキャン以下で最初に見つかるMS1スキャンを返す"""
-        candidate_scans = [scan for scan in self.all_scans if scan <= target_scan]
-        candidate_scans.sort(reverse=True)
-        
-        for scan in candidate_scans:
-            scan_data = self.df[self.df['scan_number'] == scan]
-            ms1_data = scan_data[scan_data['ms_level'] == 1]
-            if not ms1_data.empty:
-                return scan
-        
-        return None
+        i = int(np.searchsorted(self._scans_arr, target_scan, side='right')) - 1
+        if i < 0 or self._prev_ms1_idx[i] < 0:
+            return None
+        return self.all_scans[self._prev_ms1_idx[i]]
+
+    def find_nearest_scan(self, x):
+        """クリック位置に最も近いスキャン番号を二分探索で求める"""
+        i = int(np.searchsorted(self._scans_arr, x))
+        if i == len(self._scans_arr) or (i > 0 and x - self._scans_arr[i - 1] <= self._scans_arr[i] - x):
+            i -= 1
+        return self.all_scans[i]
+
+    def on_draw(self, event):
+        """再描画のたびにクロマトグラムの背景を保存し、スキャン位置の線を重ねる"""
+        if self.scan_line is None:
+            return
+        self._chrom_bg = self.canvas.copy_from_bbox(self.ax_chrom.bbox)
+        self.ax_chrom.draw_artist(self.scan_line)
+
+    def move_scan_line(self, scan_number):
+        """スキャン位置の赤線だけを保存した背景の上に描き直す"""
+        self.scan_line.set_xdata([scan_number, scan_number])
+        self.scan_line.set_visible(True)
+        if self._chrom_bg is None:
+            return
+        self.canvas.restore_region(self._chrom_bg)
+        self.ax_chrom.draw_artist(self.scan_line)
+        self.canvas.blit(self.ax_chrom.bbox)
 
     def on_click(self, event):
         """クロマトグラムクリック時の処理"""
-        if self.df is None or event.inaxes != self.ax_chrom:
+        if not self._scan_index or event.inaxes != self.ax_chrom:
             return
         x_clicked = event.xdata
         if x_clicked is None:
@@ -287,11 +470,7 @@ class MS1MS2Tab(QWidget):
         if not self.all_scans:
             return
             
-        nearest_scan = round(x_clicked)
-        
-        # 存在しないスキャン番号の場合は最も近いものを選ぶ
-        if nearest_scan not in self.all_scans:
-            nearest_scan = min(self.all_scans, key=lambda x: abs(x - nearest_scan))
+        nearest_scan = self.find_nearest_scan(x_clicked)
         
         # シンプルにクリックしたスキャンの表示を更新
         self.update_scan(nearest_scan)
@@ -301,164 +480,122 @@ class MS1MS2Tab(QWidget):
         self.current_scan = clicked_scan
         
         # クリックしたスキャンのMS2データを取得
-        clicked_spec_data = self.df[self.df['scan_number'] == clicked_scan]
-        ms2_data = clicked_spec_data[clicked_spec_data['ms_level'] == 2]
+        ms2_data = self.get_scan_arrays(clicked_scan, 2)
         
         # MS1スキャンのMS1データを取得（MS1スキャンが存在する場合のみ）
-        ms1_data = pd.DataFrame()
+        ms1_data = None
         if ms1_scan is not None:
-            ms1_spec_data = self.df[self.df['scan_number'] == ms1_scan]
-            ms1_data = ms1_spec_data[ms1_spec_data['ms_level'] == 1]
+            ms1_data = self.get_scan_arrays(ms1_scan, 1)
 
         # 赤い縦線の更新（クリックした位置）
-        self.scan_line = self.safe_remove_artist(self.scan_line)
-        self.scan_line = self.ax_chrom.axvline(clicked_scan, color='red', linestyle='--', linewidth=1)
+        self.move_scan_line(clicked_scan)
 
         # MS1の更新
-        if not ms1_data.empty:
-            self.ax_ms1.clear()
-            self.ax_ms1.set_title(f"MS1 Spectrum - Scan {ms1_scan}", fontsize=10)
-            self.ax_ms1.set_xlabel("m/z", fontsize=10)
-            self.ax_ms1.set_ylabel("Intensity")
-            self.ax_ms1.grid(True)
-            self.ax_ms1.vlines(ms1_data['mz'], 0, ms1_data['intensity'], color='blue', linewidth=1, alpha=0.7)
-            self.ax_ms1.set_xlim(self.all_mz_min, self.all_mz_max)
+        self.clear_ms1_highlights()
+        if ms1_data is not None:
+            self.ms1_title.set_text(f"MS1 Spectrum - Scan {ms1_scan}")
+            self.ms1_lines.set_segments(build_segments(
+                *self.reduce_to_pixels(self.ax_ms1, ms1_data['mz'], ms1_data['intensity'])))
             self.ax_ms1.set_ylim(0, 1e7)
         else:
             # MS1データが存在しない場合（PRMデータなど）
-            self.ax_ms1.clear()
-            self.ax_ms1.set_title("MS1 Spectrum - No MS1 data available", fontsize=10)
-            self.ax_ms1.set_xlabel("m/z", fontsize=10)
-            self.ax_ms1.set_ylabel("Intensity")
-            self.ax_ms1.grid(True)
-            self.ax_ms1.set_xlim(self.all_mz_min, self.all_mz_max)
-
-        # MS2ハイライトを消す（元のスクリプトと同じタイミング）
-        self.ms2_shading_ms1 = self.safe_remove_artist(self.ms2_shading_ms1)
+            self.ms1_title.set_text("MS1 Spectrum - No MS1 data available")
+            self.ms1_lines.set_segments([])
 
         # MS2の更新と Precursor m/z 塗りつぶし
-        if not ms2_data.empty:
-            self.ax_ms2.clear()
-            self.ax_ms2.set_title(f"MS2 Spectrum - Scan {clicked_scan}", fontsize=10)
-            self.ax_ms2.set_xlabel("m/z", fontsize=10)
-            self.ax_ms2.set_ylabel("Intensity")
-            self.ax_ms2.grid(True)
-            self.ax_ms2.vlines(ms2_data['mz'], 0, ms2_data['intensity'], color='black', linewidth=1, alpha=0.7)
+        self.ms2_highlight.set_visible(False)
+        if ms2_data is not None:
+            self.ms2_title.set_text(f"MS2 Spectrum - Scan {clicked_scan}")
             self.ax_ms2.set_xlim(self.all_mz_min, self.all_mz_max)
+            self.ms2_lines.set_segments(build_segments(
+                *self.reduce_to_pixels(self.ax_ms2, ms2_data['mz'], ms2_data['intensity'])))
 
             # プリカーサーm/zのハイライト処理
-            if 'precursor_mz' in ms2_data.columns:
-                precursor_mz = ms2_data['precursor_mz'].iloc[0]
+            if ms2_data['precursor_mz'] is not None:
+                precursor_mz = ms2_data['precursor_mz'][0]
                 mz_min = precursor_mz - 1.5
                 mz_max = precursor_mz + 1.5
 
                 # MS2スペクトルにハイライト追加
-                self.ms2_shading_ms2 = self.ax_ms2.axvspan(
-                    mz_min+1.45, mz_max-1.45, color='red', alpha=1
-                )
+                self.show_ms2_highlight(mz_min+1.45, mz_max-1.45)
 
                 # MS1データがある場合のみMS1スペクトルにもハイライト追加
-                if not ms1_data.empty:
-                    self.ms2_shading_ms1 = self.ax_ms1.axvspan(
-                        mz_min, mz_max, color='yellow', alpha=0.8
-                    )
+                if ms1_data is not None:
+                    self.add_ms1_highlight(mz_min, mz_max)
         else:
             # MS2データがない場合はMS2プロットをクリア
-            self.ax_ms2.clear()
-            self.ax_ms2.set_title(f"MS2 Spectrum - Scan {clicked_scan} (No MS2 data)")
-            self.ax_ms2.set_xlabel("m/z")
-            self.ax_ms2.set_ylabel("Intensity")
-            self.ax_ms2.grid(True)
+            self.ms2_title.set_text(f"MS2 Spectrum - Scan {clicked_scan} (No MS2 data)")
+            self.ms2_lines.set_segments([])
             self.ax_ms2.set_xlim(self.all_mz_min, self.all_mz_max)
 
-        self.figure.subplots_adjust(left=0.07)
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
         # ステータス更新
         ms1_info = f"MS1: Scan {ms1_scan}" if ms1_scan else "MS1: なし"
-        ms2_info = f"MS2: Scan {clicked_scan}" if not ms2_data.empty else "MS2: なし"
+        ms2_info = f"MS2: Scan {clicked_scan}" if ms2_data is not None else "MS2: なし"
         self.status_label.setText(f"{ms1_info}, {ms2_info} (←→キーで移動可能)")
 
     def update_scan(self, scan_number):
         """クリックしたスキャンの表示を更新"""
         self.current_scan = scan_number
-        spec_data = self.df[self.df['scan_number'] == scan_number]
-        ms1_data = spec_data[spec_data['ms_level'] == 1]
-        ms2_data = spec_data[spec_data['ms_level'] == 2]
+        ms1_data = self.get_scan_arrays(scan_number, 1)
+        ms2_data = self.get_scan_arrays(scan_number, 2)
 
         # 赤い縦線の更新
-        self.scan_line = self.safe_remove_artist(self.scan_line)
-        self.scan_line = self.ax_chrom.axvline(scan_number, color='red', linestyle='--', linewidth=1)
+        self.move_scan_line(scan_number)
 
         # MS1の更新（MS1データがある場合のみ更新）
-        if not ms1_data.empty:
+        if ms1_data is not None:
             # MS1ハイライトを削除してからMS1スペクトルを更新
-            self.ms2_shading_ms1 = self.safe_remove_artist(self.ms2_shading_ms1)
+            self.clear_ms1_highlights()
 
             #Y軸は各Scanデータの最大Intensityの25％程度にして、ノイズを取り込んでる様子を可視化
-            self.ms1_max_intensity = ms1_data['intensity'].max() / 10
-
-            self.ax_ms1.clear()
-            self.ax_ms1.set_title(f"MS1 Spectrum - Scan {scan_number}")
-            self.ax_ms1.set_xlabel("m/z")
-            self.ax_ms1.set_ylabel("Intensity")
-            self.ax_ms1.grid(True)
-            self.ax_ms1.vlines(ms1_data['mz'], 0, ms1_data['intensity'], color='blue', linewidth=1, alpha=0.7)
-            self.ax_ms1.set_xlim(self.all_mz_min, self.all_mz_max)
-            self.ax_ms1.set_ylim(0, self.ms1_max_intensity)  # 固定Y軸
-            
-            # MS1のY軸も科学的記数法に統一
-            ms1_formatter = ScalarFormatter(useMathText=True)
-            ms1_formatter.set_scientific(True)
-            ms1_formatter.set_powerlimits((-3, 3))
-            self.ax_ms1.yaxis.set_major_formatter(ms1_formatter)
+            # （表示範囲にピークがない場合は前のスキャンの値のまま）
+            if len(ms1_data['intensity']) > 0:
+                self.ms1_max_intensity = ms1_data['intensity'].max() / 10
+                self.ax_ms1.set_ylim(0, self.ms1_max_intensity)  # 固定Y軸
+
+            self.ms1_title.set_text(f"MS1 Spectrum - Scan {scan_number}")
+            self.ms1_lines.set_segments(build_segments(
+                *self.reduce_to_pixels(self.ax_ms1, ms1_data['mz'], ms1_data['intensity'])))
 
         # MS2の更新（MS2データがある場合のみ更新）
-        if not ms2_data.empty:
+        if ms2_data is not None:
             # MS2ハイライトを削除してからMS2スペクトルを更新
-            self.ms2_shading_ms2 = self.safe_remove_artist(self.ms2_shading_ms2)
-            self.ms2_mz_min = ms2_data['mz'].min()-10
-            self.ms2_mz_max = ms2_data['mz'].max()+10
-
-            self.ax_ms2.clear()
-            self.ax_ms2.set_title(f"MS2 Spectrum - Scan {scan_number}")
-            self.ax_ms2.set_xlabel("m/z")
-            self.ax_ms2.set_ylabel("Intensity")
-            self.ax_ms2.grid(True)
-            self.ax_ms2.vlines(ms2_data['mz'], 0, ms2_data['intensity'], color='black', linewidth=1, alpha=0.7)
+            self.ms2_highlight.set_visible(False)
+            if len(ms2_data['mz']) > 0:
+                self.ms2_mz_min = ms2_data['mz'].min()-10
+                self.ms2_mz_max = ms2_data['mz'].max()+10
+            else:
+                # 表示範囲にピークがない場合は全体のm/z範囲
+                self.ms2_mz_min, self.ms2_mz_max = self.all_mz_min, self.all_mz_max
+
+            self.ms2_title.set_text(f"MS2 Spectrum - Scan {scan_number}")
             self.ax_ms2.set_xlim(self.ms2_mz_min, self.ms2_mz_max)
+            self.ms2_lines.set_segments(build_segments(
+                *self.reduce_to_pixels(self.ax_ms2, ms2_data['mz'], ms2_data['intensity'])))
             
             # MS2は現在のスペクトルに応じて可変Y軸
-            current_ms2_max = ms2_data['intensity'].max() * 1.05  # 5%マージン
-            self.ax_ms2.set_ylim(0, current_ms2_max)
-            
-            # MS2のY軸を科学的記数法に統一
-            ms2_formatter = ScalarFormatter(useMathText=True)
-            ms2_formatter.set_scientific(True)
-            ms2_formatter.set_powerlimits((-3, 3))
-            self.ax_ms2.yaxis.set_major_formatter(ms2_formatter)
+            if len(ms2_data['intensity']) > 0:
+                current_ms2_max = ms2_data['intensity'].max() * 1.05  # 5%マージン
+                self.ax_ms2.set_ylim(0, current_ms2_max)
 
             # プリカーサーm/zのハイライト
-            if 'precursor_mz' in ms2_data.columns:
-                precursor_mz = ms2_data['precursor_mz'].iloc[0]
+            if ms2_data['precursor_mz'] is not None:
+                precursor_mz = ms2_data['precursor_mz'][0]
                 mz_min = precursor_mz - 1.5
                 mz_max = precursor_mz + 1.5
 
                 # MS2スペクトルにハイライト
-                self.ms2_shading_ms2 = self.ax_ms2.axvspan(
-                    mz_min+1.45, mz_max-1.45, color='red', alpha=1
-                )
+                self.show_ms2_highlight(mz_min+1.45, mz_max-1.45)
 
                 # 現在表示されているMS1スペクトルがある場合のみハイライト追加
                 if self.ax_ms1.get_title() and "No MS1 data" not in self.ax_ms1.get_title():
-                    self.ms2_shading_ms1 = self.ax_ms1.axvspan(
-                        mz_min, mz_max, color='yellow', alpha=0.8
-                    )
+                    self.add_ms1_highlight(mz_min, mz_max)
 
-        self.figure.subplots_adjust(left=0.07)
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
         # ステータス更新
-        ms1_info = "MS1: 新規表示" if not ms1_data.empty else "MS1: 保持"
-        ms2_info = "MS2: 新規表示" if not ms2_data.empty else "MS2: 保持"
+        ms1_info = "MS1: 新規表示" if ms1_data is not None else "MS1: 保持"
+        ms2_info = "MS2: 新規表示" if ms2_data is not None else "MS2: 保持"
         self.status_label.setText(f"Scan {scan_number} - {ms1_info}, {ms2_info} (←→キーで移動可能)")
\ No newline at end of file
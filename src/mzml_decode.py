@@ -0,0 +1,68 @@
+"""mzML変換のワーカープロセスで使うデコード処理（Qtやpandasを読み込まない軽いモジュール）"""
+import numpy as np
+
+# mzML変換に必要なライブラリ
+try:
+    from pyteomics import mzml
+    MZML_AVAILABLE = True
+except ImportError:
+    MZML_AVAILABLE = False
+
+# ワーカープロセスごとに開いたmzMLリーダー
+_worker_reader = None
+
+def open_indexed_reader(mzml_file_path):
+    """インデックス付きでmzMLを開く（m/zは保存時と同じfloat32でデコードする）"""
+    return mzml.read(mzml_file_path, use_index=True,
+                     dtype={'m/z array': np.float32, 'intensity array': np.float64})
+
+def init_decode_worker(reader):
+    """ワーカープロセスの初期化（親プロセスで作成したインデックスごと受け取ったリーダーを使う）"""
+    global _worker_reader
+    _worker_reader = reader
+
+def read_spectrum(spectrum):
+    """スペクトルからスキャン番号、m/z、強度、MSレベル、プリカーサーm/zを取り出す"""
+    # スペクトルIDからスキャン番号を取得
+    scan_number = spectrum.get('index', 0)
+
+    # m/zとIntensityの配列を取得
+    mz_array = spectrum.get('m/z array', [])
+    intensity_array = spectrum.get('intensity array', [])
+    ms_level = spectrum.get('ms level', None)
+
+    precursor_mz = None
+
+    if ms_level == 2:
+        try:
+            precursor = spectrum['precursorList']['precursor'][0]
+            precursor_mz = precursor['selectedIonList']['selectedIon'][0]['selected ion m/z']
+        except (KeyError, IndexError):
+            precursor_mz = None
+
+    return scan_number, mz_array, intensity_array, ms_level, precursor_mz
+
+def decode_spectra(start, stop):
+    """ワーカープロセスでstart〜stop-1番目のスペクトルをデコードし、列ごとの配列を返す"""
+    spectra = []
+    for i in range(start, stop):
+        try:
+            spectra.append(read_spectrum(_worker_reader[i]))
+        except Exception as e:
+            # lxmlの例外などはpickleできずメインプロセスに返せないため、メッセージだけの例外にする
+            raise RuntimeError(f"spectrum {i}: {e}") from None
+    counts = [len(mz_array) for _, mz_array, _, _, _ in spectra]
+
+    # スペクトル単位の値は保存時のデータ型の配列にしてから、ピーク数分だけまとめて繰り返す
+    # （MSレベルが無いスペクトルは0、プリカーサーが無い場合はNaN）
+    scan_numbers = np.array([s[0] for s in spectra], dtype=np.int32)
+    ms_levels = np.array([s[3] or 0 for s in spectra], dtype=np.int8)
+    precursors = np.array([np.nan if s[4] is None else s[4] for s in spectra], dtype=np.float32)
+
+    return {
+        'scan_number': np.repeat(scan_numbers, counts),
+        'mz': np.concatenate([s[1] for s in spectra]),
+        'intensity': np.concatenate([s[2] for s in spectra]),
+        'ms_level': np.repeat(ms_levels, counts),
+        'precursor_mz': np.repeat(precursors, counts),
+    }
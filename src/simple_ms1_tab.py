@@ -6,8 +6,16 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib.ticker import ScalarFormatter
 
-import matplotlib.pyplot as plt
-plt.rcParams['font.family'] = 'Yu Gothic'
+from spectrum_kernels import build_segments, pixel_reduce, warm_up
+
+# 表示処理で使うデータ型（float32で十分な精度があり、メモリ転送量が半分になる）
+SPECTRUM_DTYPES = {
+    'scan_number': np.int32,
+    'mz': np.float32,
+    'intensity': np.float32,
+    'ms_level': np.int8,
+    'precursor_mz': np.float32,
+}
 
 class SimpleMS1Tab(QWidget):
     def __init__(self):
@@ -15,8 +23,15 @@ class SimpleMS1Tab(QWidget):
         self.df = None
         self.current_scan = None
         self.all_scans = []
+        self._scans_arr = np.array([], dtype=np.int64)
+        self._starts = np.zeros(1, dtype=np.int64)
+        self._mz = np.array([], dtype=np.float32)
+        self._intensity_pct = np.array([], dtype=np.float32)
+        self._scan_max = np.array([], dtype=np.float32)
+        self._var_scale = np.array([], dtype=np.float32)
         self.global_max_intensity = 0
         self.scan_line = None
+        self._chrom_bg = None
         
         self.setup_ui()
         
@@ -58,6 +73,7 @@ class SimpleMS1Tab(QWidget):
         
         # イベント接続
         self.canvas.mpl_connect("button_press_event", self.on_click)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
         
     def show_initial_plots(self):
         """初期状態のプロット表示"""
@@ -75,14 +91,25 @@ class SimpleMS1Tab(QWidget):
         self.ax_ms1_fixed.set_title("MS1 Spectrum (Fixed Height)")
         
         self.figure.tight_layout()
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
     def set_data(self, df):
         """外部からデータをセット"""
-        self.df = df.copy()
+        # 浅いコピーに型を変える列だけを入れ直す（他の列はコピーせず共有し、共有データは変更しない）
+        # astypeはpandas 2では全列をコピーするため使わない
+        self.df = df.copy(deep=False)
+        for name, dtype in self.display_dtypes(df).items():
+            if df[name].dtype != dtype:
+                self.df[name] = df[name].astype(dtype)
         self.status_label.setText(f"データ受信完了 ({len(df)} 行) - MS1データを処理してください")
         self.process_button.setEnabled(True)
         
+    def display_dtypes(self, df):
+        """存在する列の変換先データ型（整数列は欠損値を含みうる浮動小数点のままなら変換しない）"""
+        return {name: dtype for name, dtype in SPECTRUM_DTYPES.items()
+                if name in df.columns
+                and (np.issubdtype(dtype, np.floating) or pd.api.types.is_integer_dtype(df[name]))}
+
     def process_ms1_data(self):
         """MS1データの処理"""
         if self.df is None:
@@ -97,6 +124,9 @@ class SimpleMS1Tab(QWidget):
                                              f"必要な列が見つかりません: {required_cols}")
                 return
 
+            # numbaの関数を初回の処理時にコンパイルしておく
+            warm_up()
+
             # MS1データのみフィルタリング
             self.df = self.df[self.df['ms_level'] == 1]
             
@@ -105,28 +135,45 @@ class SimpleMS1Tab(QWidget):
                 return
 
             # スキャン番号を連番に振り直し
-            unique_scans = sorted(self.df['scan_number'].unique())
-            scan_mapping = {old_scan: new_scan for new_scan, old_scan in enumerate(unique_scans, 1)}
-            self.df['scan_number'] = self.df['scan_number'].map(scan_mapping)
+            _, scan_order = np.unique(self.df['scan_number'].to_numpy(), return_inverse=True)
+            self.df = self.df.assign(scan_number=(scan_order + 1).astype(np.int32))
+
+            self.sort_by_scan_and_mz()
+
+            # 列の配列を一度だけ取り出し、最大強度・m/z範囲・クロマトグラムをまとめて計算
+            scan_numbers = self.df['scan_number'].to_numpy()
+            mz = self.df['mz'].to_numpy()
+            intensity = self.df['intensity'].to_numpy()
 
-            # 全体の最大強度を計算
-            self.global_max_intensity = self.df['intensity'].max()
+            # 全体の最大強度とm/z範囲
+            self.global_max_intensity = intensity.max()
+            self.all_mz_min = mz.min() - 10
+            self.all_mz_max = mz.max() + 10
+
+            # スキャンごとの配列を作成（クリック・キー操作時は全行を検索しない）
+            self.build_scan_index(scan_numbers, mz, intensity)
 
             # クロマトグラムの作成
-            chrom_df = self.df.groupby("scan_number")["intensity"].sum().reset_index()
-            chrom_df = chrom_df.sort_values("scan_number")
-            self.all_scans = chrom_df["scan_number"].tolist()
+            # スキャン番号は1からの連番（int32）に振り直してあるので、元データが浮動小数点でも
+            # 番号をそのまま添字にして強度を合計できる
+            totals = np.bincount(scan_numbers, weights=intensity)
+            self._scans_arr = np.flatnonzero(np.bincount(scan_numbers))
+            self.all_scans = self._scans_arr.tolist()
+            chrom_intensity = totals[self._scans_arr]
 
             self.ax_chrom.clear()
-            self.ax_chrom.plot(chrom_df["scan_number"], chrom_df["intensity"], color="black")
+            self.ax_chrom.plot(self._scans_arr, chrom_intensity, color="black")
             self.ax_chrom.set_title("MS1 Chromatogram")
             self.ax_chrom.set_xlabel("Scan Number")
             self.ax_chrom.set_ylabel("Total Intensity")
             self.ax_chrom.grid(True)
+            self.ax_chrom.autoscale_view()
+            self.ax_chrom.set_autoscale_on(False)
 
-            # m/z範囲の設定
-            self.all_mz_min = self.df['mz'].min() - 10
-            self.all_mz_max = self.df['mz'].max() + 10
+            # スキャン位置の赤線（通常の描画には含めず、ブリットで重ねる）
+            self.scan_line = self.ax_chrom.axvline(self.all_scans[0], color='red', linestyle='--',
+                                                   linewidth=2, animated=True)
+            self.scan_line.set_visible(False)
 
             # 科学的記数法のフォーマッタ
             formatter = ScalarFormatter(useMathText=True)
@@ -138,7 +185,7 @@ class SimpleMS1Tab(QWidget):
             self.setup_spectrum_plots()
 
             self.figure.tight_layout()
-            self.canvas.draw()
+            self.canvas.draw_idle()
 
             self.status_label.setText(f"MS1処理完了 - スキャン数: {len(self.all_scans)} (クロマトグラムをクリックしてください)")
             
@@ -151,40 +198,98 @@ class SimpleMS1Tab(QWidget):
             QtWidgets.QMessageBox.critical(self, "処理エラー", f"MS1データの処理中にエラーが発生しました:\n{str(e)}")
             
     def setup_spectrum_plots(self):
-        """スペクトルプロットの初期設定"""
+        """スペクトルプロットの初期設定（スペクトルの線と注記は作成したものを使い回す）"""
         self.ax_ms1_var.clear()
-        self.ax_ms1_var.set_title("MS1 Spectrum (Variable Height)")
+        self.var_title = self.ax_ms1_var.set_title("MS1 Spectrum (Variable Height)")
         self.ax_ms1_var.set_xlabel("m/z")
         self.ax_ms1_var.set_ylabel("Intensity (%)")
         self.ax_ms1_var.grid(True)
+        self.var_lines = self.ax_ms1_var.vlines([], 0, [], color='black', linewidth=1, alpha=0.7)
+        self.var_text = self.ax_ms1_var.text(0.02, 0.98, '', 
+                                             transform=self.ax_ms1_var.transAxes, 
+                                             verticalalignment='top', 
+                                             bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8))
+        self.var_text.set_visible(False)
         self.ax_ms1_var.set_xlim(self.all_mz_min, self.all_mz_max)
+        self.ax_ms1_var.set_ylim(0, 100)
 
         self.ax_ms1_fixed.clear()
-        self.ax_ms1_fixed.set_title("MS1 Spectrum (Fixed Height)")
+        self.fixed_title = self.ax_ms1_fixed.set_title("MS1 Spectrum (Fixed Height)")
         self.ax_ms1_fixed.set_xlabel("m/z")
         self.ax_ms1_fixed.set_ylabel("Intensity (%)")
         self.ax_ms1_fixed.grid(True)
+        self.fixed_lines = self.ax_ms1_fixed.vlines([], 0, [], color='black', linewidth=1, alpha=0.7)
+        self.fixed_text = self.ax_ms1_fixed.text(0.02, 0.98, f'Global Max: {self.global_max_intensity:.2e}', 
+                                                 transform=self.ax_ms1_fixed.transAxes, 
+                                                 verticalalignment='top', 
+                                                 bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.8))
+        self.fixed_text.set_visible(False)
         self.ax_ms1_fixed.set_xlim(self.all_mz_min, self.all_mz_max)
         self.ax_ms1_fixed.set_ylim(0, 100)
+        
+        # 範囲は固定なので、線の更新時に自動調整させない
+        self.ax_ms1_var.set_autoscale_on(False)
+        self.ax_ms1_fixed.set_autoscale_on(False)
+
+    def reduce_to_pixels(self, ax, mz, intensity):
+        """横軸の1ピクセルに複数のピークが入る場合は最大強度のピークだけを残す"""
+        n_pixels = max(int(ax.bbox.width), 1)
+        if len(mz) <= n_pixels:
+            return mz, intensity
+        mz_min, mz_max = ax.get_xlim()
+        return pixel_reduce(mz, intensity, mz_min, mz_max, n_pixels)
 
     def keyPressEvent(self, event):
         """キー操作でスキャン移動"""
         if self.current_scan is None or not self.all_scans:
             return
-        idx = self.all_scans.index(self.current_scan)
+        idx = int(np.searchsorted(self._scans_arr, self.current_scan))
         if event.key() == QtCore.Qt.Key_Left and idx > 0:
             self.update_scan(self.all_scans[idx - 1])
         elif event.key() == QtCore.Qt.Key_Right and idx < len(self.all_scans) - 1:
             self.update_scan(self.all_scans[idx + 1])
 
-    def safe_remove_artist(self, artist):
-        """アーティストを安全に削除する関数"""
-        if artist is not None:
-            try:
-                artist.remove()
-            except (NotImplementedError, ValueError):
-                pass
-        return None
+    def sort_by_scan_and_mz(self):
+        """scan_number・mzの順に並べる（各スキャンが連続した範囲になる。並んでいれば何もしない）"""
+        scan_step = np.diff(self.df['scan_number'].to_numpy())
+        mz_step = np.diff(self.df['mz'].to_numpy())
+        if np.all((scan_step > 0) | ((scan_step == 0) & (mz_step >= 0))):
+            return
+        self.df = self.df.sort_values(['scan_number', 'mz'], kind='stable', ignore_index=True)
+
+    def build_scan_index(self, scan_numbers, mz, intensity):
+        """各スキャンの開始位置と、スキャンごとの最大強度・倍率の配列を作成する（スキャン番号-1を添字とする）"""
+        # scan_number順に並んだ1からの連番なので、番号が変わる位置が各スキャンの開始位置になる
+        self._starts = np.concatenate(([0], np.flatnonzero(np.diff(scan_numbers)) + 1, [len(scan_numbers)]))
+        # 強度は全体の最大強度を100%とした値にしておき、スキャン内の最大強度を100%にする倍率も持たせる
+        self._mz = mz
+        self._intensity_pct = intensity * (100.0 / self.global_max_intensity)
+        self._scan_max = np.maximum.reduceat(intensity, self._starts[:-1])
+        self._var_scale = self.global_max_intensity / self._scan_max
+
+    def find_nearest_scan(self, x):
+        """クリック位置に最も近いスキャン番号を二分探索で求める"""
+        i = int(np.searchsorted(self._scans_arr, x))
+        if i == len(self._scans_arr) or (i > 0 and x - self._scans_arr[i - 1] <= self._scans_arr[i] - x):
+            i -= 1
+        return self.all_scans[i]
+
+    def on_draw(self, event):
+        """再描画のたびにクロマトグラムの背景を保存し、スキャン位置の線を重ねる"""
+        if self.scan_line is None:
+            return
+        self._chrom_bg = self.canvas.copy_from_bbox(self.ax_chrom.bbox)
+        self.ax_chrom.draw_artist(self.scan_line)
+
+    def move_scan_line(self, scan_number):
+        """スキャン位置の赤線だけを保存した背景の上に描き直す"""
+        self.scan_line.set_xdata([scan_number, scan_number])
+        self.scan_line.set_visible(True)
+        if self._chrom_bg is None:
+            return
+        self.canvas.restore_region(self._chrom_bg)
+        self.ax_chrom.draw_artist(self.scan_line)
+        self.canvas.blit(self.ax_chrom.bbox)
 
     def on_click(self, event):
         """クロマトグラムクリック時の処理"""
@@ -195,74 +300,48 @@ class SimpleMS1Tab(QWidget):
             return
         if not self.all_scans:
             return
-        nearest_scan = round(x_clicked)
-        
-        # 存在しないスキャン番号の場合は最も近いものを選ぶ
-        if nearest_scan not in self.all_scans:
-            nearest_scan = min(self.all_scans, key=lambda x: abs(x - nearest_scan))
+        nearest_scan = self.find_nearest_scan(x_clicked)
         self.update_scan(nearest_scan)
 
     def update_scan(self, scan_number):
         """指定されたスキャンのスペクトルを表示"""
         self.current_scan = scan_number
         
-        # 選択したスキャンのMS1データを取得
-        scan_data = self.df[self.df['scan_number'] == scan_number]
-        
-        if scan_data.empty:
+        if not 1 <= scan_number < len(self._starts):
             return
 
+        # 選択したスキャンのMS1データ（scan_number順に並んだ配列のスライス）
+        start, stop = self._starts[scan_number - 1], self._starts[scan_number]
+
         # 赤い縦線の更新
-        self.scan_line = self.safe_remove_artist(self.scan_line)
-        self.scan_line = self.ax_chrom.axvline(scan_number, color='red', linestyle='--', linewidth=2)
+        self.move_scan_line(scan_number)
 
         # 現在のスキャンの最大強度
-        current_max_intensity = scan_data['intensity'].max()
+        current_max_intensity = self._scan_max[scan_number - 1]
 
-        # numpy配列に変換して高速化
-        mz_values = scan_data['mz'].values
-        intensity_values = scan_data['intensity'].values
+        # 描画する線は横軸のピクセル数までに間引く（左右の図は同じm/z範囲・幅）
+        mz_values, intensity_percent_fixed = self.reduce_to_pixels(
+            self.ax_ms1_var, self._mz[start:stop], self._intensity_pct[start:stop])
 
         # MS1スペクトル（１）: 可変高さ - 現在のスペクトルの最大強度を100%とする
-        self.ax_ms1_var.clear()
-        self.ax_ms1_var.set_title(f"Y軸・自動補正 - Scan {scan_number}")
-        self.ax_ms1_var.set_xlabel("m/z")
-        self.ax_ms1_var.set_ylabel("Intensity (%)")
-        self.ax_ms1_var.grid(True)
+        self.var_title.set_text(f"Y軸・自動補正 - Scan {scan_number}")
         
-        # 直接計算して描画（パーセンテージ変換を簡略化）
-        intensity_percent_var = (intensity_values / current_max_intensity) * 100
-        self.ax_ms1_var.vlines(mz_values, 0, intensity_percent_var, color='black', linewidth=1, alpha=0.7)
-        self.ax_ms1_var.set_xlim(self.all_mz_min, self.all_mz_max)
-        self.ax_ms1_var.set_ylim(0, 100)
+        # 全体基準の%値にスキャンごとの倍率を掛ける
+        intensity_percent_var = intensity_percent_fixed * self._var_scale[scan_number - 1]
+        self.var_lines.set_segments(build_segments(mz_values, intensity_percent_var))
         
         # 現在の最大強度を指数表記で表示
-        self.ax_ms1_var.text(0.02, 0.98, f'Max: {current_max_intensity:.2e}', 
-                            transform=self.ax_ms1_var.transAxes, 
-                            verticalalignment='top', 
-                            bbox=dict(boxstyle='round', facecolor='lightblue', alpha=0.8))
+        self.var_text.set_text(f'Max: {current_max_intensity:.2e}')
+        self.var_text.set_visible(True)
 
         # MS1スペクトル（２）: 固定高さ - 全体の最大強度を100%とする
-        self.ax_ms1_fixed.clear()
-        self.ax_ms1_fixed.set_title(f"Y軸・固定 - Scan {scan_number}")
-        self.ax_ms1_fixed.set_xlabel("m/z")
-        self.ax_ms1_fixed.set_ylabel("Intensity (%)")
-        self.ax_ms1_fixed.grid(True)
-        
-        # 直接計算して描画（パーセンテージ変換を簡略化）
-        intensity_percent_fixed = (intensity_values / self.global_max_intensity) * 100
-        self.ax_ms1_fixed.vlines(mz_values, 0, intensity_percent_fixed, color='black', linewidth=1, alpha=0.7)
-        self.ax_ms1_fixed.set_xlim(self.all_mz_min, self.all_mz_max)
-        self.ax_ms1_fixed.set_ylim(0, 100)
+        self.fixed_title.set_text(f"Y軸・固定 - Scan {scan_number}")
+        self.fixed_lines.set_segments(build_segments(mz_values, intensity_percent_fixed))
         
         # 全体の最大強度を指数表記で表示
-        self.ax_ms1_fixed.text(0.02, 0.98, f'Global Max: {self.global_max_intensity:.2e}', 
-                              transform=self.ax_ms1_fixed.transAxes, 
-                              verticalalignment='top', 
-                              bbox=dict(boxstyle='round', facecolor='lightgreen', alpha=0.8))
+        self.fixed_text.set_visible(True)
 
-        self.figure.tight_layout()
-        self.canvas.draw()
+        self.canvas.draw_idle()
         
         # ステータス更新
         self.status_label.setText(f"Scan {scan_number} を表示中 (←→キーで移動可能)")
\ No newline at end of file
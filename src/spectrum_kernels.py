@@ -0,0 +1,144 @@
+"""スペクトル描画用の数値計算（numbaがあればJITコンパイルして使う）"""
+import sys
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# exe化した環境ではキャッシュの保存先が見つからずエラーになるため、キャッシュしない
+NUMBA_CACHE = not getattr(sys, 'frozen', False)
+
+# warm_up()を実行済みかどうか
+_warmed_up = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=NUMBA_CACHE, fastmath=True, nogil=True)
+    def build_segments(mz, intensity):
+        """スペクトルの縦線（m/z, 0）-（m/z, 強度）をLineCollection用の線分配列にする"""
+        n = len(mz)
+        segments = np.zeros((n, 2, 2))
+        for k in range(n):
+            segments[k, 0, 0] = mz[k]
+            segments[k, 1, 0] = mz[k]
+            segments[k, 1, 1] = intensity[k]
+        return segments
+
+    @njit(cache=NUMBA_CACHE, nogil=True)
+    def build_stems(mz, intensity):
+        """スペクトルの縦線を、NaNで区切った1本の折れ線（x, y）にする"""
+        n = len(mz)
+        x = np.empty(3 * n)
+        y = np.empty(3 * n)
+        for k in range(n):
+            x[3 * k] = mz[k]
+            x[3 * k + 1] = mz[k]
+            x[3 * k + 2] = np.nan
+            y[3 * k] = 0.0
+            y[3 * k + 1] = intensity[k]
+            y[3 * k + 2] = np.nan
+        return x, y
+
+    @njit(cache=NUMBA_CACHE, fastmath=True, nogil=True)
+    def pixel_reduce(mz, intensity, xmin, xmax, n_bins):
+        """m/z範囲をn_bins個に分け、各区間で最大強度のピークだけを残す"""
+        best = np.full(n_bins, -1, np.int64)
+        scale = n_bins / (xmax - xmin)
+        for k in range(len(mz)):
+            b = int(np.floor((mz[k] - xmin) * scale))
+            if b < 0:
+                b = 0
+            elif b >= n_bins:
+                b = n_bins - 1
+            if best[b] < 0 or intensity[k] > intensity[best[b]]:
+                best[b] = k
+
+        count = 0
+        for b in range(n_bins):
+            if best[b] >= 0:
+                count += 1
+        mz_out = np.empty(count, mz.dtype)
+        intensity_out = np.empty(count, intensity.dtype)
+        j = 0
+        for b in range(n_bins):
+            k = best[b]
+            if k >= 0:
+                mz_out[j] = mz[k]
+                intensity_out[j] = intensity[k]
+                j += 1
+        return mz_out, intensity_out
+
+    @njit(cache=NUMBA_CACHE, fastmath=True, nogil=True, parallel=True)
+    def group_sum_argmax(values, starts):
+        """starts[g]からstarts[g+1]までの各区間の合計と、最大値をとる位置（全体での添字）を返す"""
+        n_groups = len(starts) - 1
+        sums = np.empty(n_groups, np.float64)
+        argmax = np.empty(n_groups, np.int64)
+        for g in prange(n_groups):
+            best = starts[g]
+            total = 0.0
+            for k in range(starts[g], starts[g + 1]):
+                total += values[k]
+                if values[k] > values[best]:
+                    best = k
+            sums[g] = total
+            argmax[g] = best
+        return sums, argmax
+
+else:
+    def build_segments(mz, intensity):
+        """スペクトルの縦線（m/z, 0）-（m/z, 強度）をLineCollection用の線分配列にする"""
+        segments = np.zeros((len(mz), 2, 2))
+        segments[:, :, 0] = mz[:, None]
+        segments[:, 1, 1] = intensity
+        return segments
+
+    def build_stems(mz, intensity):
+        """スペクトルの縦線を、NaNで区切った1本の折れ線（x, y）にする"""
+        x = np.empty((len(mz), 3))
+        y = np.empty((len(mz), 3))
+        x[:, :2] = mz[:, None]
+        x[:, 2] = np.nan
+        y[:, 0] = 0.0
+        y[:, 1] = intensity
+        y[:, 2] = np.nan
+        return x.ravel(), y.ravel()
+
+    def pixel_reduce(mz, intensity, xmin, xmax, n_bins):
+        """m/z範囲をn_bins個に分け、各区間で最大強度のピークだけを残す"""
+        # numba版と同じ式（float64で計算して切り捨て）で区間を決める
+        scale = n_bins / (xmax - xmin)
+        bins = np.clip(np.floor((mz.astype(np.float64) - xmin) * scale).astype(np.int64), 0, n_bins - 1)
+        order = np.lexsort((-intensity, bins))
+        bins = bins[order]
+        first = order[np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])]
+        return mz[first], intensity[first]
+
+    def group_sum_argmax(values, starts):
+        """starts[g]からstarts[g+1]までの各区間の合計と、最大値をとる位置（全体での添字）を返す"""
+        sums = np.add.reduceat(values, starts[:-1], dtype=np.float64)
+        group_max = np.maximum.reduceat(values, starts[:-1])
+        # 区間の最大値と等しい位置のうち、各区間で最初のもの
+        candidates = np.flatnonzero(values == np.repeat(group_max, np.diff(starts)))
+        return sums, candidates[np.searchsorted(candidates, starts[:-1])]
+
+
+def warm_up():
+    """初回のクリックでコンパイル待ちが発生しないよう、使用するデータ型で一度実行しておく"""
+    global _warmed_up
+    if _warmed_up or not NUMBA_AVAILABLE:
+        return
+    _warmed_up = True
+    mz = np.array([100.0, 100.5, 101.0, 102.0], dtype=np.float32)
+    starts = np.array([0, 2, 4], dtype=np.int64)
+    for intensity in (np.array([1, 4, 2, 3], dtype=np.int64),
+                      np.array([1, 4, 2, 3], dtype=np.float32),
+                      np.array([1, 4, 2, 3], dtype=np.float64)):
+        pixel_reduce(mz, intensity, 99.0, 103.0, 2)
+        build_segments(mz, intensity)
+        build_stems(mz, intensity)
+        group_sum_argmax(intensity, starts)
@@ -2,14 +2,86 @@ import pandas as pd
 import numpy as np
 from PySide6 import QtWidgets, QtCore
 from PySide6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QLabel
+from PySide6.QtCore import Signal, QThread
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 from matplotlib.ticker import ScalarFormatter
 from matplotlib.gridspec import GridSpec
 from matplotlib.ticker import FormatStrFormatter
+from matplotlib.patches import Rectangle
 
-import matplotlib.pyplot as plt
-plt.rcParams['font.family'] = 'Yu Gothic'
+from spectrum_kernels import build_stems, group_sum_argmax, pixel_reduce, warm_up
+
+# このタブで使う列と表示処理で使うデータ型（float32で十分な精度があり、メモリ転送量が半分になる）
+SPECTRUM_DTYPES = {
+    'scan_number': np.int32,
+    'mz': np.float32,
+    'intensity': np.float32,
+    'ms_level': np.int8,
+}
+
+class MS1ProcessingThread(QThread):
+    """MS1データの数値処理（並べ替え・スキャンごとの集計）を別スレッドで実行するクラス"""
+    processing_finished = Signal(bool, object)  # 成功/失敗、処理結果のdict（失敗時はエラーメッセージ）
+
+    def __init__(self, df):
+        super().__init__()
+        self.df = df
+
+    def run(self):
+        """MS1データの処理"""
+        try:
+            # numbaの関数を初回の処理時にコンパイルしておく
+            warm_up()
+            self.processing_finished.emit(True, self.process(self.df))
+        except Exception as e:
+            self.processing_finished.emit(False, str(e))
+
+    def process(self, df):
+        """MS1データを抽出・集計し、表示に使う配列をdictで返す（MS1データがなければNone）"""
+        # MS1データのみフィルタリング
+        df = df[df['ms_level'] == 1]
+        if df.empty:
+            return None
+
+        # スキャン番号を連番に振り直し
+        _, scan_order = np.unique(df['scan_number'].to_numpy(), return_inverse=True)
+        df = df.assign(scan_number=(scan_order + 1).astype(np.int32))
+
+        # スキャン番号・m/zの順に並べ、各スキャンの開始位置を求める
+        df = self.sort_by_scan_and_mz(df)
+        scan_numbers = df['scan_number'].to_numpy()
+        starts = np.searchsorted(scan_numbers, np.arange(1, scan_numbers[-1] + 2))
+
+        # スキャンごとの強度の合計（クロマトグラム）と最大強度の位置を一度に求める
+        mz = df['mz'].to_numpy()
+        intensity = df['intensity'].to_numpy()
+        chrom_intensity, max_intensity_idx = group_sum_argmax(intensity, starts)
+
+        # Max列を追加：各スキャンで最も強度の高いスペクトルに1、それ以外は0
+        max_flag = np.zeros(len(df), dtype=np.uint8)
+        max_flag[max_intensity_idx] = 1
+        df = df.assign(Max=max_flag)
+
+        return {
+            'df': df,
+            'starts': starts,
+            'mz': mz,
+            'intensity': intensity,
+            'chrom_intensity': chrom_intensity,
+            # Max列が1のスペクトルの強度とm/z（スキャン番号-1を添字とする配列）
+            'max_intensity_per_scan': intensity[max_intensity_idx],
+            'center_mz_per_scan': mz[max_intensity_idx],
+            'mz_range': (mz.min(), mz.max()),
+        }
+
+    def sort_by_scan_and_mz(self, df):
+        """scan_number・mzの順に並べる（各スキャンが連続した範囲になる。並んでいれば何もしない）"""
+        scan_step = np.diff(df['scan_number'].to_numpy())
+        mz_step = np.diff(df['mz'].to_numpy())
+        if np.all((scan_step > 0) | ((scan_step == 0) & (mz_step >= 0))):
+            return df
+        return df.sort_values(['scan_number', 'mz'], kind='stable', ignore_index=True)
 
 class ZoomViewerTab(QWidget):
     def __init__(self):
@@ -17,11 +89,35 @@ class ZoomViewerTab(QWidget):
         self.df = None
         self.current_scan = None
         self.all_scans = []
+        self._scans_arr = np.array([], dtype=np.int64)
         self.max_spectrum_intensity = 0
         self.max_spectrum_mz_center = 0
         self.scan_line = None
+        self._chrom_bg = None
+        self._var_bg = None
+        self._mz = np.array([], dtype=np.float32)
+        self._intensity = np.array([], dtype=np.float32)
+        self._max_intensity_per_scan = np.array([], dtype=np.float32)
+        self._center_mz_per_scan = np.array([], dtype=np.float32)
+        self._pct_buf = np.empty(0, dtype=np.float32)
+        self._zoom_buf = np.empty(0, dtype=np.float32)
+        self._starts = np.zeros(1, dtype=np.int64)
+        self._process_thread = None
         
         self.setup_ui()
+
+        # 拡大表示の再描画は少し待ってからまとめて行う（キーを押し続けたときは最後のスキャンだけ描画）
+        self._zoom_timer = QtCore.QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(30)
+        self._zoom_timer.timeout.connect(self.update_zoom_panels)
+
+        # キー操作はスキャン番号だけ進め、入力が途切れたら表示する（キーリピートの途中は描画しない）
+        # 待ち時間はOSのキーリピート間隔（30〜50ms程度）以上にして、連続入力をまとめる
+        self._key_timer = QtCore.QTimer(self)
+        self._key_timer.setSingleShot(True)
+        self._key_timer.setInterval(50)
+        self._key_timer.timeout.connect(lambda: self.update_scan(self.current_scan))
         
     def setup_ui(self):
         """UI要素の初期化"""
@@ -64,6 +160,7 @@ class ZoomViewerTab(QWidget):
         
         # イベント接続
         self.canvas.mpl_connect("button_press_event", self.on_click)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
         
     def show_initial_plots(self):
         """初期状態のプロット表示"""
@@ -89,135 +186,255 @@ class ZoomViewerTab(QWidget):
         
     def set_data(self, df):
         """外部からデータをセット"""
-        self.df = df.copy()
+        # 浅いコピーから使わない列を外し、型を変える列だけを入れ直す（他の列はコピーせず共有する）
+        # 列の選択やastypeはpandas 2では全列をコピーするため使わない
+        self.df = df.copy(deep=False)
+        for name in df.columns:
+            if name not in SPECTRUM_DTYPES:
+                del self.df[name]
+        for name, dtype in self.display_dtypes(df).items():
+            if df[name].dtype != dtype:
+                self.df[name] = df[name].astype(dtype)
+        # 処理中の場合は、完了後に新しいデータで処理し直す
+        if self._process_thread is not None and self._process_thread.isRunning():
+            self.status_label.setText(f"データ受信完了 ({len(df)} 行) - 処理中のデータの完了後に再処理します")
+            return
         self.status_label.setText(f"データ受信完了 ({len(df)} 行) - MS1データを処理してください")
         self.process_button.setEnabled(True)
         
+    def display_dtypes(self, df):
+        """存在する列の変換先データ型（整数列は欠損値を含みうる浮動小数点のままなら変換しない）"""
+        return {name: dtype for name, dtype in SPECTRUM_DTYPES.items()
+                if name in df.columns
+                and (np.issubdtype(dtype, np.floating) or pd.api.types.is_integer_dtype(df[name]))}
+
     def process_ms1_data(self):
-        """MS1データの処理"""
+        """MS1データの処理（集計は別スレッドで行い、終わったらグラフを作成する）"""
         if self.df is None:
             QtWidgets.QMessageBox.warning(self, "警告", "データが読み込まれていません")
             return
+        if self._process_thread is not None and self._process_thread.isRunning():
+            return
             
-        try:
-            # 必要な列の確認
-            required_cols = {"scan_number", "intensity", "ms_level", "mz"}
-            if not required_cols.issubset(self.df.columns):
-                QtWidgets.QMessageBox.critical(self, "エラー", 
-                                             f"必要な列が見つかりません: {required_cols}")
-                return
-
-            # MS1データのみフィルタリング
-            self.df = self.df[self.df['ms_level'] == 1]
-            
-            if self.df.empty:
-                QtWidgets.QMessageBox.critical(self, "エラー", "MS1データが見つかりません")
-                return
-
-            # スキャン番号を連番に振り直し
-            unique_scans = sorted(self.df['scan_number'].unique())
-            scan_mapping = {old_scan: new_scan for new_scan, old_scan in enumerate(unique_scans, 1)}
-            self.df['scan_number'] = self.df['scan_number'].map(scan_mapping)
-
-            # Max列を追加：各スキャンで最も強度の高いスペクトルに1、それ以外は0
-            self.df['Max'] = 0
-            max_intensity_idx = self.df.groupby('scan_number')['intensity'].idxmax()
-            self.df.loc[max_intensity_idx, 'Max'] = 1
-
-            # Max列が1のスペクトルの最大強度とm/z範囲を計算
-            max_spectra = self.df[self.df['Max'] == 1]
-            self.max_spectrum_intensity = max_spectra['intensity'].max()
-            
-            if not max_spectra.empty:
-                self.max_spectrum_mz_center = max_spectra['mz'].iloc[0]
-            else:
-                self.max_spectrum_mz_center = self.df['mz'].mean()
-
-            # クロマトグラムの作成
-            chrom_df = self.df.groupby("scan_number")["intensity"].sum().reset_index()
-            chrom_df = chrom_df.sort_values("scan_number")
-            self.all_scans = chrom_df["scan_number"].tolist()
-
-            self.ax_chrom.clear()
-            self.ax_chrom.plot(chrom_df["scan_number"], chrom_df["intensity"], color="black")
-            self.ax_chrom.set_title("MS1 Chromatogram")
-            self.ax_chrom.set_xlabel("Scan Number")
-            self.ax_chrom.set_ylabel("Total Intensity")
-            self.ax_chrom.grid(True)
-
-            # m/z範囲の設定
-            self.all_mz_min = self.df['mz'].min() - 10
-            self.all_mz_max = self.df['mz'].max() + 10
-
-            # 科学的記数法のフォーマッタ
-            formatter = ScalarFormatter(useMathText=True)
-            formatter.set_scientific(True)
-            formatter.set_powerlimits((-3, 3))
-            self.ax_chrom.yaxis.set_major_formatter(formatter)
-
-            # 初期のMS1スペクトルプロット（空）
-            self.setup_spectrum_plots()
-
-            self.figure.tight_layout()
-            self.canvas.draw()
-
-            self.status_label.setText(f"MS1処理完了 - スキャン数: {len(self.all_scans)} (クロマトグラムをクリックしてください)")
-            
-            # 自動的に中央のスキャンを表示
-            if self.all_scans:
-                middle_scan = self.all_scans[len(self.all_scans)//2]
-                self.update_scan(middle_scan)
+        # 必要な列の確認
+        required_cols = {"scan_number", "intensity", "ms_level", "mz"}
+        if not required_cols.issubset(self.df.columns):
+            QtWidgets.QMessageBox.critical(self, "エラー", 
+                                         f"必要な列が見つかりません: {required_cols}")
+            return
+
+        self._process_thread = MS1ProcessingThread(self.df)
+        self._process_thread.processing_finished.connect(self.on_processing_finished)
 
+        # UI更新
+        self.process_button.setEnabled(False)
+        self.status_label.setText("MS1データを処理中...")
+
+        self._process_thread.start()
+
+    def on_processing_finished(self, success, result):
+        """処理完了時の処理"""
+        # 処理中に新しいデータを受け取った場合は結果を使わず、新しいデータで処理し直す
+        self.process_button.setEnabled(True)
+        if self._process_thread.df is not self.df:
+            self._process_thread.wait()
+            self.process_ms1_data()
+            if self._process_thread.isRunning():
+                self.status_label.setText("新しいデータを受信したため、MS1データを再処理中...")
+            return
+
+        if not success:
+            QtWidgets.QMessageBox.critical(self, "処理エラー", f"MS1データの処理中にエラーが発生しました:\n{result}")
+            return
+        if result is None:
+            QtWidgets.QMessageBox.critical(self, "エラー", "MS1データが見つかりません")
+            return
+
+        try:
+            self.show_processed_data(result)
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "処理エラー", f"MS1データの処理中にエラーが発生しました:\n{str(e)}")
-            
+
+    def show_processed_data(self, result):
+        """処理結果を保持し、クロマトグラムと中央のスキャンを表示する"""
+        self.df = result['df']
+        self._starts = result['starts']
+
+        # スキャンごとの配列は列の配列のスライスで取り出す（クリック・キー操作時は全行を検索しない）
+        self._mz = result['mz']
+        self._intensity = result['intensity']
+
+        # %値の計算結果を書き込む作業用配列（最も長いスキャンの長さで一度だけ確保）
+        # 拡大表示の線はデータを参照し続けるので、別の配列にする
+        max_scan_len = np.diff(self._starts).max()
+        self._pct_buf = np.empty(max_scan_len, dtype=np.float32)
+        self._zoom_buf = np.empty(max_scan_len, dtype=np.float32)
+
+        self._max_intensity_per_scan = result['max_intensity_per_scan']
+        self._center_mz_per_scan = result['center_mz_per_scan']
+        self.max_spectrum_intensity = self._max_intensity_per_scan.max()
+        self.max_spectrum_mz_center = self._center_mz_per_scan[0]
+
+        # クロマトグラムの作成
+        # スキャン番号は1からの連番
+        chrom_intensity = result['chrom_intensity']
+        self._scans_arr = np.arange(1, len(chrom_intensity) + 1)
+        self.all_scans = self._scans_arr.tolist()
+
+        # 前回の処理で保存した背景は使わない
+        self._chrom_bg = None
+        self._var_bg = None
+
+        self.ax_chrom.clear()
+        self.ax_chrom.plot(self._scans_arr, chrom_intensity, color="black")
+        self.ax_chrom.set_title("MS1 Chromatogram")
+        self.ax_chrom.set_xlabel("Scan Number")
+        self.ax_chrom.set_ylabel("Total Intensity")
+        self.ax_chrom.grid(True)
+        self.ax_chrom.autoscale_view()
+        self.ax_chrom.set_autoscale_on(False)
+
+        # スキャン位置の赤線（通常の描画には含めず、ブリットで重ねる）
+        self.scan_line = self.ax_chrom.axvline(self.all_scans[0], color='red', linestyle='--',
+                                               linewidth=2, animated=True)
+        self.scan_line.set_visible(False)
+
+        # m/z範囲の設定
+        mz_min, mz_max = result['mz_range']
+        self.all_mz_min = mz_min - 10
+        self.all_mz_max = mz_max + 10
+
+        # 科学的記数法のフォーマッタ
+        formatter = ScalarFormatter(useMathText=True)
+        formatter.set_scientific(True)
+        formatter.set_powerlimits((-3, 3))
+        self.ax_chrom.yaxis.set_major_formatter(formatter)
+
+        # 初期のMS1スペクトルプロット（空）
+        self.setup_spectrum_plots()
+
+        # 自動的に中央のスキャンを表示（拡大表示も待たずに描く）
+        if self.all_scans:
+            middle_scan = self.all_scans[len(self.all_scans)//2]
+            self.update_scan(middle_scan)
+            self._zoom_timer.stop()
+            self.update_zoom_panels()
+
+        # レイアウトはスキャンを表示した状態で一度だけ調整する（スキャン移動時は調整しない）
+        self.figure.tight_layout()
+        self.canvas.draw_idle()
+
+        self.status_label.setText(f"MS1処理完了 - スキャン数: {len(self.all_scans)} (クロマトグラムをクリックしてください)")
+
     def setup_spectrum_plots(self):
-        """スペクトルプロットの初期設定"""
+        """スペクトルプロットの初期設定（タイトル・スペクトルの線・黄色の範囲は作成したものを使い回す）"""
         self.ax_ms1_var.clear()
-        self.ax_ms1_var.set_title("MS1 Spectrum (Variable Height)")
+        self.var_title = self.ax_ms1_var.set_title("MS1 Spectrum (Variable Height)")
         self.ax_ms1_var.set_xlabel("m/z")
         self.ax_ms1_var.set_ylabel("Intensity (%)")
         self.ax_ms1_var.grid(True)
+        # 全体表示の線と黄色の範囲は通常の描画には含めず、ブリットで重ねる
+        self.var_lines, = self.ax_ms1_var.plot([], [], color='black', linewidth=1, alpha=0.7,
+                                               animated=True)
+        self.var_span = self.add_span(self.ax_ms1_var, animated=True)
         self.ax_ms1_var.set_xlim(self.all_mz_min, self.all_mz_max)
+        self.ax_ms1_var.set_ylim(0, 100)
 
         self.ax_ms1_fixed.clear()
-        self.ax_ms1_fixed.set_title("MS1 Spectrum (Fixed Height)")
+        self.fixed_title = self.ax_ms1_fixed.set_title("MS1 Spectrum (Fixed Height)")
         self.ax_ms1_fixed.set_xlabel("m/z")
         self.ax_ms1_fixed.set_ylabel("Intensity (%)")
         self.ax_ms1_fixed.grid(True)
+        self.fixed_lines, = self.ax_ms1_fixed.plot([], [], color='black', linewidth=1, alpha=0.7)
+        self.fixed_span = self.add_span(self.ax_ms1_fixed)
         zoom_min = self.max_spectrum_mz_center - 0.5
         zoom_max = self.max_spectrum_mz_center + 2.5
         self.ax_ms1_fixed.set_xlim(zoom_min, zoom_max)
-        self.ax_ms1_fixed.set_ylim(0, 100)
+        self.ax_ms1_fixed.set_ylim(0, 15)
 
         self.ax_ms1_zoom.clear()
-        self.ax_ms1_zoom.set_title("MS1 Spectrum (Zoom)")
+        self.zoom_title = self.ax_ms1_zoom.set_title("MS1 Spectrum (Zoom)")
         self.ax_ms1_zoom.set_xlabel("m/z")
         self.ax_ms1_zoom.set_ylabel("Intensity (%)")
         self.ax_ms1_zoom.grid(True)
+        self.zoom_line, = self.ax_ms1_zoom.plot([], [], color='black', linewidth=0.8)
+        self.ax_ms1_zoom.xaxis.set_major_formatter(FormatStrFormatter('%.3f'))
+        self.ax_ms1_zoom.tick_params(axis='x', labelsize=8)
         zoom_min = self.max_spectrum_mz_center - 0.1
         zoom_max = self.max_spectrum_mz_center + 0.5
         self.ax_ms1_zoom.set_xlim(zoom_min, zoom_max)
         self.ax_ms1_zoom.set_ylim(0, 100)
 
+        # 範囲はスキャンごとに指定するので、線の更新時に自動調整させない
+        for ax in (self.ax_ms1_var, self.ax_ms1_fixed, self.ax_ms1_zoom):
+            ax.set_autoscale_on(False)
+
+    def add_span(self, ax, animated=False):
+        """m/z範囲を透明黄色で塗りつぶす長方形（縦方向は軸の高さいっぱい）を作成する"""
+        span = Rectangle((0, 0), 0, 1, transform=ax.get_xaxis_transform(),
+                         color='yellow', alpha=0.7, animated=animated)
+        ax.add_patch(span)
+        return span
+
+    def reduce_to_pixels(self, ax, mz, intensity):
+        """横軸の1ピクセルに複数のピークが入る場合は最大強度のピークだけを残す"""
+        n_pixels = max(int(ax.bbox.width), 1)
+        if len(mz) <= n_pixels:
+            return mz, intensity
+        mz_min, mz_max = ax.get_xlim()
+        return pixel_reduce(mz, intensity, mz_min, mz_max, n_pixels)
+
+    def to_percent(self, intensity, max_intensity, buffer):
+        """max_intensityを100%とした値に変換する（結果は作業用配列の先頭に書き込む）"""
+        out = buffer[:len(intensity)]
+        np.multiply(intensity, np.float32(100 / max_intensity), out=out)
+        return out
+
+    def set_span(self, span, mz_min, mz_max):
+        """黄色の範囲を移動する"""
+        span.set_x(mz_min)
+        span.set_width(mz_max - mz_min)
+
     def keyPressEvent(self, event):
         """キー操作でスキャン移動"""
         if self.current_scan is None or not self.all_scans:
             return
-        idx = self.all_scans.index(self.current_scan)
+        idx = int(np.searchsorted(self._scans_arr, self.current_scan))
         if event.key() == QtCore.Qt.Key_Left and idx > 0:
-            self.update_scan(self.all_scans[idx - 1])
+            self.current_scan = self.all_scans[idx - 1]
         elif event.key() == QtCore.Qt.Key_Right and idx < len(self.all_scans) - 1:
-            self.update_scan(self.all_scans[idx + 1])
+            self.current_scan = self.all_scans[idx + 1]
+        else:
+            return
+        event.accept()
+        self._key_timer.start()
+
+    def find_nearest_scan(self, x):
+        """クリック位置に最も近いスキャン番号を二分探索で求める"""
+        i = int(np.searchsorted(self._scans_arr, x))
+        if i == len(self._scans_arr) or (i > 0 and x - self._scans_arr[i - 1] <= self._scans_arr[i] - x):
+            i -= 1
+        return self.all_scans[i]
 
-    def safe_remove_artist(self, artist):
-        """アーティストを安全に削除する関数"""
-        if artist is not None:
-            try:
-                artist.remove()
-            except (NotImplementedError, ValueError):
-                pass
-        return None
+    def on_draw(self, event):
+        """再描画のたびにクロマトグラムと全体表示の背景を保存し、スキャンごとに変わる線を重ねる"""
+        if self.scan_line is None:
+            return
+        self._chrom_bg = self.canvas.copy_from_bbox(self.ax_chrom.bbox)
+        self._var_bg = self.canvas.copy_from_bbox(self.ax_ms1_var.bbox)
+        self.ax_chrom.draw_artist(self.scan_line)
+        self.ax_ms1_var.draw_artist(self.var_span)
+        self.ax_ms1_var.draw_artist(self.var_lines)
+
+    def move_scan_line(self, scan_number):
+        """スキャン位置の赤線だけを保存した背景の上に描き直す"""
+        self.scan_line.set_xdata([scan_number, scan_number])
+        self.scan_line.set_visible(True)
+        if self._chrom_bg is None:
+            return
+        self.canvas.restore_region(self._chrom_bg)
+        self.ax_chrom.draw_artist(self.scan_line)
+        self.canvas.blit(self.ax_chrom.bbox)
 
     def on_click(self, event):
         """クロマトグラムクリック時の処理"""
@@ -228,82 +445,75 @@ class ZoomViewerTab(QWidget):
             return
         if not self.all_scans:
             return
-        nearest_scan = round(x_clicked)
-        
-        # 存在しないスキャン番号の場合は最も近いものを選ぶ
-        if nearest_scan not in self.all_scans:
-            nearest_scan = min(self.all_scans, key=lambda x: abs(x - nearest_scan))
+        nearest_scan = self.find_nearest_scan(x_clicked)
         self.update_scan(nearest_scan)
 
     def update_scan(self, scan_number):
-        """指定されたスキャンのスペクトルを表示"""
+        """指定されたスキャンのスペクトルを表示（全体表示はすぐに、拡大表示は少し待ってから描画）"""
         self.current_scan = scan_number
         
-        scan_data = self.df[self.df['scan_number'] == scan_number]
-        
-        if scan_data.empty:
+        if not 1 <= scan_number < len(self._starts):
             return
+        mz_values, intensity_values = self.scan_arrays(scan_number)
 
-        # 赤い縦線の更新
-        self.scan_line = self.safe_remove_artist(self.scan_line)
-        self.scan_line = self.ax_chrom.axvline(scan_number, color='red', linestyle='--', linewidth=2)
+        # Max列が1のスペクトルのm/zを中心にする
+        self.current_center_mz = self._center_mz_per_scan[scan_number - 1]
 
-        current_max_intensity = scan_data['intensity'].max()
-        mz_values = scan_data['mz'].values
-        intensity_values = scan_data['intensity'].values
+        # 赤い縦線と全体表示のスペクトルはすぐに描き直す
+        self.update_overview(scan_number, mz_values, intensity_values)
 
-        # Max列が1のデータがあるかチェック
-        max_data = scan_data[scan_data['Max'] == 1]
+        # 拡大表示の2つはキー操作が止まってからまとめて描画する
+        self._zoom_timer.start()
         
-        if max_data.empty:
-            # 代替として最大強度のm/z値を使用
-            max_idx = scan_data['intensity'].idxmax()
-            self.current_center_mz = scan_data.loc[max_idx, 'mz']
-        else:
-            self.current_center_mz = max_data['mz'].iloc[0]
+        # ステータス更新
+        self.status_label.setText(f"Scan {scan_number} を表示中 (←→キーで移動可能)")
+
+    def scan_arrays(self, scan_number):
+        """指定されたスキャンのmz・強度の配列（scan_number順に並んだ列のスライス）"""
+        start, stop = self._starts[scan_number - 1], self._starts[scan_number]
+        return self._mz[start:stop], self._intensity[start:stop]
+
+    def update_overview(self, scan_number, mz_values, intensity_values):
+        """赤い縦線と全体表示のスペクトルを、保存した背景の上に描き直す"""
+        self.move_scan_line(scan_number)
 
         # MS1スペクトル（１）: 可変高さ
-        self.ax_ms1_var.clear()
-        self.ax_ms1_var.set_title(f"マススペクトル全体 Scan {scan_number}")
-        self.ax_ms1_var.set_xlabel("m/z")
-        self.ax_ms1_var.set_ylabel("Intensity (%)")
-        self.ax_ms1_var.grid(True)
+        self.var_title.set_text(f"マススペクトル全体 Scan {scan_number}")
+        current_max_intensity = self._max_intensity_per_scan[scan_number - 1]
         
-        intensity_percent_var = (intensity_values / current_max_intensity) * 100
-        self.ax_ms1_var.vlines(mz_values, 0, intensity_percent_var, color='black', linewidth=1, alpha=0.7)
-        self.ax_ms1_var.set_xlim(self.all_mz_min, self.all_mz_max)
-        self.ax_ms1_var.set_ylim(0, 100)
+        # 全体表示は横軸のピクセル数までに間引く（拡大表示の2つは間引かない）
+        mz_var, intensity_var = self.reduce_to_pixels(self.ax_ms1_var, mz_values, intensity_values)
+        intensity_percent_var = self.to_percent(intensity_var, current_max_intensity, self._pct_buf)
+        self.var_lines.set_data(*build_stems(mz_var, intensity_percent_var))
         
         # Max中心±4の範囲を透明黄色で塗りつぶし
-        zoom_min_left = self.current_center_mz - 1
-        zoom_max_left = self.current_center_mz + 3
-        self.ax_ms1_var.axvspan(zoom_min_left, zoom_max_left, color='yellow', alpha=0.7)
+        self.set_span(self.var_span, self.current_center_mz - 1, self.current_center_mz + 3)
+
+        if self._var_bg is None:
+            return
+        self.canvas.restore_region(self._var_bg)
+        self.ax_ms1_var.draw_artist(self.var_span)
+        self.ax_ms1_var.draw_artist(self.var_lines)
+        self.canvas.blit(self.ax_ms1_var.bbox)
+
+    def update_zoom_panels(self):
+        """現在のスキャンの拡大表示2つを描き直す"""
+        scan_number = self.current_scan
+        if scan_number is None or not 1 <= scan_number < len(self._starts):
+            return
+        mz_values, intensity_values = self.scan_arrays(scan_number)
 
         # MS1スペクトル（２）: 固定高さ、ズーム表示
-        self.ax_ms1_fixed.clear()
-        self.ax_ms1_fixed.set_title(f"拡大して同位体パターンを見る　Scan {scan_number}")
-        self.ax_ms1_fixed.set_xlabel("m/z")
-        self.ax_ms1_fixed.set_ylabel("Intensity (%)")
-        self.ax_ms1_fixed.grid(True)
+        self.fixed_title.set_text(f"拡大して同位体パターンを見る　Scan {scan_number}")
 
         # Max中心±4の範囲を透明黄色で塗りつぶし
-        zoom_min_left = self.current_center_mz - 0.02
-        zoom_max_left = self.current_center_mz + 0.02
-        self.ax_ms1_fixed.axvspan(zoom_min_left, zoom_max_left, color='yellow', alpha=0.7)
+        self.set_span(self.fixed_span, self.current_center_mz - 0.02, self.current_center_mz + 0.02)
 
         # MS1スペクトル（３）: さらに拡大
-        self.ax_ms1_zoom.clear()
-        self.ax_ms1_zoom.set_title(f"さらに拡大して分解能を理解する　Scan {scan_number}")
-        self.ax_ms1_zoom.set_xlabel("m/z")
-        self.ax_ms1_zoom.set_ylabel("Intensity (%)")
-        self.ax_ms1_zoom.grid(True)
+        self.zoom_title.set_text(f"さらに拡大して分解能を理解する　Scan {scan_number}")
         
-        # 現在のスキャンでMax列が1のスペクトルの最大強度を取得
-        current_max_spectra = scan_data[scan_data['Max'] == 1]
-        if not current_max_spectra.empty:
-            current_max_spectrum_intensity = current_max_spectra['intensity'].max()
-        else:
-            current_max_spectrum_intensity = current_max_intensity
+        # 現在のスキャンでMax列が1のスペクトルの強度を取得
+        current_max_spectrum_intensity = self._max_intensity_per_scan[scan_number - 1]
         
         # ズーム範囲を設定
         zoom_min_1 = self.current_center_mz - 0.5
@@ -312,22 +522,22 @@ class ZoomViewerTab(QWidget):
         zoom_max_2 = self.current_center_mz + 0.02
         zoom_mid_2 = (zoom_min_2 + zoom_max_2) / 2
         
-        # 現在のスキャンのMax列が1のスペクトル強度を基準に100%変換
-        intensity_percent_fixed = (intensity_values / current_max_spectrum_intensity) * 100
-        self.ax_ms1_fixed.vlines(mz_values, 0, intensity_percent_fixed, color='black', linewidth=1, alpha=0.7)
+        # 現在のスキャンのMax列が1のスペクトル強度を基準に100%変換（表示範囲内のピークだけ）
+        # スキャン内はm/z順に並んでいるので、範囲は二分探索で切り出す
+        lo = np.searchsorted(mz_values, zoom_min_1)
+        hi = np.searchsorted(mz_values, zoom_max_1, side='right')
+        intensity_percent_fixed = self.to_percent(intensity_values[lo:hi], current_max_spectrum_intensity,
+                                                  self._pct_buf)
+        self.fixed_lines.set_data(*build_stems(mz_values[lo:hi], intensity_percent_fixed))
         self.ax_ms1_fixed.set_xlim(zoom_min_1, zoom_max_1)
-        self.ax_ms1_fixed.set_ylim(0, 15)
 
-        # 更に拡大したビュー
-        self.ax_ms1_zoom.plot(mz_values, intensity_percent_fixed, color='black', linewidth=0.8)
+        # 更に拡大したビュー（線が枠の外へ続くよう、範囲の両側の1点も含める）
+        lo = max(np.searchsorted(mz_values, zoom_min_2) - 1, 0)
+        hi = np.searchsorted(mz_values, zoom_max_2, side='right') + 1
+        intensity_percent_zoom = self.to_percent(intensity_values[lo:hi], current_max_spectrum_intensity,
+                                                 self._zoom_buf)
+        self.zoom_line.set_data(mz_values[lo:hi], intensity_percent_zoom)
         self.ax_ms1_zoom.set_xlim(zoom_min_2, zoom_max_2)
         self.ax_ms1_zoom.set_xticks([zoom_min_2, zoom_mid_2, zoom_max_2])
-        self.ax_ms1_zoom.xaxis.set_major_formatter(FormatStrFormatter('%.3f'))
-        self.ax_ms1_zoom.tick_params(axis='x', labelsize=8)
-        self.ax_ms1_zoom.set_ylim(0, 100)       
 
-        self.figure.tight_layout()
-        self.canvas.draw()
-        
-        # ステータス更新
-        self.status_label.setText(f"Scan {scan_number} を表示中 (←→キーで移動可能)")
\ No newline at end of file
+        self.canvas.draw_idle()